@@ -1,10 +1,23 @@
+import time
+import uuid
 import streamlit as st
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, AIMessage
 from src.graph.workflow import app
+from src.graph.memory import compactar_mensagens, carregar_mensagens, apagar_spill, memoria_residente
+from src.graph.prompts import relatorio_cache
+from src.graph.llm import relatorio_latencia
+from src.graph.deadline import relatorio_prazos
+from src.agents.entrevista import FORMULARIO_ENTREVISTA
+from src.tools.utils import FinancialProfile
+from pydantic import ValidationError
 
 load_dotenv()
 
+# quantas mensagens ficam sempre visiveis (e em memória no chat_view), o resto vai para o historico paginado
+MENSAGENS_RECENTES = 20
+MENSAGENS_POR_PAGINA = 20
+
 st.set_page_config(page_title="Banco Ágil - IA", page_icon="🏦")
 
 st.title("🏦 Banco Ágil - Atendimento Inteligente")
@@ -17,59 +30,179 @@ if "agent_state" not in st.session_state:
         "authenticated": False,
         "score": 0,
         "cpf": None,
-        "limite_atual": 0.0
+        "limite_atual": 0.0,
+        "cliente": None
     }
 
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = uuid.uuid4().hex
+    st.session_state["mensagens_em_disco"] = 0
+
+# cache do que aparece na tela: lista de (role, texto) montada incrementalmente,
+# assim não precisamos percorrer todas as mensagens do grafo a cada rerun.
+# Guarda só as MENSAGENS_RECENTES últimas, o histórico anterior é remontado do disco quando pedido
+if "chat_view" not in st.session_state:
+    st.session_state["chat_view"] = []
+    st.session_state["chat_view_index"] = 0
+    st.session_state["chat_view_total"] = 0
+    st.session_state["render_ms"] = 0.0
+    st.session_state["turn_ms"] = 0.0
+
+
+def para_exibicao(messages):
+    novos = []
+    for msg in messages:
+        if isinstance(msg, HumanMessage):
+            novos.append(("user", msg.content))
+        elif isinstance(msg, AIMessage) and msg.content:
+            novos.append(("assistant", msg.content))
+    return novos
+
+
+def sincronizar_chat_view():
+    """Converte somente as mensagens novas do estado para o cache de exibição."""
+    messages = st.session_state["agent_state"]["messages"]
+    novos = para_exibicao(messages[st.session_state["chat_view_index"]:])
+    chat_view = st.session_state["chat_view"]
+    chat_view.extend(novos)
+    del chat_view[:-MENSAGENS_RECENTES]
+    st.session_state["chat_view_index"] = len(messages)
+    st.session_state["chat_view_total"] += len(novos)
+    return novos
+
+
+def historico_anterior():
+    """Tudo o que já saiu do chat_view: remontado do spill em disco + mensagens ainda residentes."""
+    messages = carregar_mensagens(st.session_state["session_id"]) + st.session_state["agent_state"]["messages"]
+    return para_exibicao(messages)[:-len(st.session_state["chat_view"]) or None]
+
+
+def render_message(role, content):
+    with st.chat_message(role):
+        st.write(content)
+
+
+inicio_render = time.perf_counter()
+
+sincronizar_chat_view()
+recentes = st.session_state["chat_view"]
+total_antigas = st.session_state["chat_view_total"] - len(recentes)
+
+#historico antigo só é lido e desenhado se o usuario pedir, e uma pagina por vez
+if total_antigas and st.toggle(f"Mostrar histórico anterior ({total_antigas} mensagens)", key="mostrar_historico"):
+    antigas = historico_anterior()
+    total_paginas = (len(antigas) - 1) // MENSAGENS_POR_PAGINA + 1
+    pagina = st.number_input("Página", min_value=1, max_value=total_paginas, value=total_paginas)
+    fim = len(antigas) - (total_paginas - pagina) * MENSAGENS_POR_PAGINA
+    for role, content in antigas[max(0, fim - MENSAGENS_POR_PAGINA):fim]:
+        render_message(role, content)
+    st.markdown("---")
+
+for role, content in recentes:
+    render_message(role, content)
+
+st.session_state["render_ms"] = (time.perf_counter() - inicio_render) * 1000
+
+
+def executar_turno(user_message):
+    current_state = st.session_state["agent_state"]
+    current_state["messages"].append(user_message)
+
+    with st.spinner("Processando..."):
+        try:
+            inicio_turno = time.perf_counter()
+            new_state = app.invoke(current_state)
+            st.session_state["turn_ms"] = (time.perf_counter() - inicio_turno) * 1000
+
+            st.session_state["agent_state"] = new_state
+
+            # desenha só o que chegou neste turno, sem st.rerun (que redesenhava tudo de novo)
+            for role, content in sincronizar_chat_view():
+                if role == "assistant":
+                    render_message(role, content)
+
+            # mensagens antigas vão para o disco, a tela continua usando o chat_view
+            residentes, enviadas = compactar_mensagens(st.session_state["session_id"], new_state["messages"])
+            if enviadas:
+                new_state["messages"] = residentes
+                st.session_state["chat_view_index"] -= enviadas
+                st.session_state["mensagens_em_disco"] += enviadas
+
+        except Exception as e:
+            st.error(f"Ocorreu um erro no processamento: {e}")
+
+
+#modo formulario da entrevista: os cinco dados vão numa mensagem só e o grafo não chama o LLM
+if st.session_state.get("modo_formulario") and st.session_state["agent_state"].get("authenticated"):
+    with st.form("formulario_entrevista", clear_on_submit=True):
+        st.subheader("📝 Atualização de perfil financeiro")
+        renda = st.number_input("Renda mensal (R$)", min_value=0.0, step=100.0)
+        emprego = st.selectbox("Tipo de emprego", ["formal", "autônomo", "desempregado"])
+        despesas = st.number_input("Despesas fixas mensais (R$)", min_value=0.0, step=100.0)
+        dependentes = st.number_input("Número de dependentes", min_value=0, step=1)
+        dividas = st.radio("Possui dívidas ativas?", ["Não", "Sim"], horizontal=True)
+        enviado = st.form_submit_button("Enviar e recalcular score")
+
+    if enviado:
+        try:
+            profile = FinancialProfile(
+                monthly_income=renda,
+                employment_type=emprego,
+                monthly_expenses=despesas,
+                dependents=int(dependentes),
+                has_active_debt=dividas == "Sim",
+            )
+        except ValidationError as e:
+            st.error(f"Formulário inválido: {e}")
+        else:
+            resumo = (f"Renda mensal: R$ {renda:.2f} | Emprego: {emprego} | Despesas: R$ {despesas:.2f} | "
+                      f"Dependentes: {int(dependentes)} | Dívidas ativas: {dividas}")
+            render_message("user", resumo)
+            executar_turno(HumanMessage(content=resumo, additional_kwargs={FORMULARIO_ENTREVISTA: profile.model_dump()}))
+
+
+if prompt := st.chat_input("Digite sua mensagem..."):
 
+    render_message("user", prompt)
+    executar_turno(HumanMessage(content=prompt))
+
+
+#sidebar fica no final para já mostrar o estado depois do turno
 with st.sidebar:
     st.header("🛠 Painel de Controle")
     st.info("Este painel mostra o estado interno da IA.")
-    
+
     state = st.session_state["agent_state"]
-    
+
     st.metric(label="Status Autenticação", value="✅ Logado" if state.get("authenticated") else "🔒 Bloqueado")
     st.metric(label="Tentativas Falhas", value=f"{state.get('auth_attempts', 0)}/3")
-    
+
     if state.get("authenticated"):
         st.write(f"**👤 CPF:** {state.get('cpf')}")
         st.write("nenhum = triagem")
         st.metric(label="Estado atual", value=state.get("user_intent"))
-    
-    if st.button("Reiniciar Conversa"):
-        del st.session_state["agent_state"]
-        st.rerun()
+        st.toggle("📝 Entrevista por formulário", key="modo_formulario")
 
-for msg in st.session_state["agent_state"]["messages"]:
-    if isinstance(msg, HumanMessage):
-        with st.chat_message("user"):
-            st.write(msg.content)
-    elif isinstance(msg, AIMessage):
-        if msg.content: 
-            with st.chat_message("assistant"):
-                st.write(msg.content)
+    st.metric(label="Render do chat (ms)", value=f"{st.session_state['render_ms']:.1f}")
+    st.metric(label="Último turno (ms)", value=f"{st.session_state['turn_ms']:.0f}")
+    st.metric(label="Memória da sessão (KB)", value=f"{memoria_residente(state, st.session_state['chat_view']) / 1024:.1f}")
+    st.metric(label="Mensagens em disco", value=st.session_state["mensagens_em_disco"])
 
+    with st.expander("Cache de prompt por chamada"):
+        for call_site, uso in relatorio_cache().items():
+            st.write(f"**{call_site}:** {uso['cache_ratio']:.0%} de {uso['input_tokens']} tokens ({uso['chamadas']} chamadas)")
 
-if prompt := st.chat_input("Digite sua mensagem..."):
-    
-    with st.chat_message("user"):
-        st.write(prompt)
-    
-    current_state = st.session_state["agent_state"]
-    user_message = HumanMessage(content=prompt)
-    current_state["messages"].append(user_message)
-    
-    with st.spinner("Processando..."):
-        try:
-            new_state = app.invoke(current_state)
-            
-            st.session_state["agent_state"] = new_state
-            
-            last_message = new_state["messages"][-1]
-            if isinstance(last_message, AIMessage):
-                with st.chat_message("assistant"):
-                    st.write(last_message.content)
-            
-            st.rerun()
-            
-        except Exception as e:
-            st.error(f"Ocorreu um erro no processamento: {e}")
\ No newline at end of file
+    with st.expander("Latência por tier de modelo"):
+        for tier, lat in relatorio_latencia().items():
+            st.write(f"**{tier}** ({lat['modelo']}): média {lat['media_ms']:.0f} ms, máx {lat['max_ms']:.0f} ms ({lat['chamadas']} chamadas)")
+
+    with st.expander("Prazos estourados por nó"):
+        for no, prazo in relatorio_prazos().items():
+            st.write(f"**{no}:** {prazo['estouros']} estouros, {prazo['loops_cortados']} loops cortados em {prazo['execucoes']} execuções")
+
+    if st.button("Reiniciar Conversa"):
+        del st.session_state["agent_state"]
+        del st.session_state["chat_view"]
+        apagar_spill(st.session_state["session_id"])
+        del st.session_state["session_id"]
+        st.rerun()
@@ -1,25 +1,26 @@
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage
 from src.tools.api_client import cotacao_serpapi
 from src.graph.state import AgentState
-from src.graph.llm import llm
+from src.graph.llm import llm_para
+from src.graph.prompts import invocar
 
 
 tools_cambio = [cotacao_serpapi]
 
-
-def cambio_node(state: AgentState):
-    messages = state['messages']
-    
-    llm_with_tools = llm.bind_tools(tools_cambio)
-    
-    system_msg = SystemMessage(content="""
+PROMPT_CAMBIO = """
     Você é um Agente de Câmbio.
     Se o usuário pedir cotação, USE a ferramenta 'cotacao_serpapi'.
     Se o usuario começar a fugir do assunto educadamente tente retornar ao ponto.
     Após receber o dado da ferramenta, responda o usuário amigavelmente e encerre a conversa cordialmente.
-    """)
+    """
+
+
+def cambio_node(state: AgentState):
+    messages = state['messages']
+    
+    llm_with_tools = llm_para("cambio").bind_tools(tools_cambio)
     
-    response = llm_with_tools.invoke([system_msg] + messages)
+    # ramo de um pedido composto (ver workflow.ramo_paralelo)
+    contexto = {"escopo": state["escopo"]} if state.get("escopo") else None
+    response = invocar(llm_with_tools, "cambio", PROMPT_CAMBIO, messages, contexto)
 
     return {"messages": [response]}
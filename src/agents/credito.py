@@ -3,7 +3,8 @@ from langchain_core.messages import AIMessage, SystemMessage
 from pydantic import BaseModel, Field
 
 from src.graph.state import AgentState
-from src.graph.llm import llm
+from src.graph.llm import llm_para
+from src.graph.prompts import invocar
 from src.tools.csv_handler import (
     buscar_dados_cliente, 
     verificar_elegibilidade_aumento, 
@@ -38,7 +39,7 @@ def credit_node(state: AgentState):
     current_limit = float(client_data['limite_atual']) if client_data else 0.0
     current_score = int(client_data['score']) if client_data else 0
     
-    structured_llm = llm.with_structured_output(UserRequest)
+    structured_llm = llm_para("user_request").with_structured_output(UserRequest)
     extraction_prompt = SystemMessage(content="""
         Analise a última mensagem do usuário.
         1. Se ele pediu aumento de limite e informou um valor, extraia o valor em 'desired_limit'.
@@ -93,19 +94,12 @@ def credit_node(state: AgentState):
             "messages": [AIMessage(content="Certo. Para isso, preciso confirmar algumas informações sobre sua renda e despesas atuais. Vamos começar?")]
         }
 
-    response = llm.invoke([SystemMessage(content=system_context)] + messages)
+    response = llm_para("credito").invoke([SystemMessage(content=system_context)] + messages)
     
     return {"messages": [response]}
 
 
-#o que esta rodando agora
-#entendo que o workflow anterior garantiria a regra de negocio mais estritamente mas não seria um true agente
-def credit_node_with_tools(state: AgentState):
-    messages = state['messages']
-    
-    llm_with_tools = llm.bind_tools(tools_credito)
-
-    system_msg = SystemMessage(content=f"""
+PROMPT_CREDITO = """
     Você é um Agente de Crédito.
     Se o usuário pedir aumento de limite, USE OBRIGATORIAMENTE o processo a baixo:
         1 - gerar OBRIGATORIAMENTE o pedido dessa solicitação ultiliZando a ferramenta 'registrar_solicitacao' com o status OBRIGATORIO de 'pendente'.
@@ -119,9 +113,21 @@ def credit_node_with_tools(state: AgentState):
     Se for reprovado o usuario tem o direito de uma entrevista de credito feita por outro agente.
     voce NUNCA em HIPOTESE NENHUMA deve falar que sera transferidos para outro agente todos os agentes são voce mesmo.
     de maneira nenhuma esqueça de gravar a aprovação ou rejeição do limite no final.
-    Contexto: {state}
-    """)
+    Os dados do cliente autenticado estão no bloco CONTEXTO ATUAL no final da conversa.
+    """
+
+
+#o que esta rodando agora
+#entendo que o workflow anterior garantiria a regra de negocio mais estritamente mas não seria um true agente
+def credit_node_with_tools(state: AgentState):
+    messages = state['messages']
     
-    response = llm_with_tools.invoke([system_msg] + messages)
+    llm_with_tools = llm_para("credito").bind_tools(tools_credito)
+
+    contexto = {campo: state.get(campo) for campo in ("cpf", "authenticated", "user_intent", "cliente")}
+    if state.get("escopo"):
+        # ramo de um pedido composto (ver workflow.ramo_paralelo)
+        contexto["escopo"] = state["escopo"]
+    response = invocar(llm_with_tools, "credito", PROMPT_CREDITO, messages, contexto)
 
     return {"messages": [response]}
@@ -1,12 +1,18 @@
 from langchain_core.messages import SystemMessage, AIMessage
 
 from src.graph.state import AgentState
-from src.graph.llm import llm
+from src.graph.llm import llm_para
+from src.graph.prompts import invocar
 from src.tools.csv_handler import atualizar_score_cliente
 from src.tools.utils import (
+    FinancialProfile,
     extract_financial_profile,
     calculate_score
 )
+from src.graph.audit import audit_log
+
+# chave em additional_kwargs da HumanMessage enviada pelo formulário da entrevista no app
+FORMULARIO_ENTREVISTA = "formulario_entrevista"
 
 
 #depreciado pela função abaixo
@@ -42,7 +48,7 @@ def interview_node(state: AgentState):
         - Exemplo: "Para começarmos, qual é a sua renda mensal líquida aproximada?"
         """
         
-        response = llm.invoke([SystemMessage(content=system_prompt)] + messages)
+        response = llm_para("entrevista").invoke([SystemMessage(content=system_prompt)] + messages)
         return {"messages": [response]}
     #else desnecesauro
     else:
@@ -71,15 +77,7 @@ def interview_node(state: AgentState):
 tools_entrevista = [calculate_score, atualizar_score_cliente]
 
 
-#vamos fazer a mesma coisa só que agora com um agente de verdade
-def interview_node_with_tools(state: AgentState):
-    messages = state['messages']
-    
-    cpf = state.get('cpf', 'não informado')
-
-    llm_with_tools = llm.bind_tools(tools_entrevista)
-
-    system_msg = SystemMessage(content=f"""
+PROMPT_ENTREVISTA = """
     # IDENTIDADE E OBJETIVO
     Você é um Agente de Entrevista de Crédito do Banco Ágil. Seu objetivo é coletar as informações financeiras do cliente para calcular e atualizar seu score de crédito.
 
@@ -91,12 +89,58 @@ def interview_node_with_tools(state: AgentState):
         - Número de dependentes
         - Se possui dívidas ativas
     2.  **Cálculo do Score:** Assim que tiver TODAS as informações, OBRIGATORIAMENTE use a ferramenta `calculate_score` para calcular o novo score.
-    3.  **Atualização do Score:** Após o cálculo, OBRIGATORIAMENTE use a ferramenta `atualizar_score_cliente` para salvar o novo score no perfil do cliente. O CPF do cliente é: {cpf}.
+    3.  **Atualização do Score:** Após o cálculo, OBRIGATORIAMENTE use a ferramenta `atualizar_score_cliente` para salvar o novo score no perfil do cliente. O CPF do cliente está no bloco CONTEXTO ATUAL no final da conversa.
     4.  **Finalização:** Após salvar o score, informe o cliente sobre a atualização e pergunte se ele deseja reavaliar seu limite ou se deseja encerrar o atendimento.
     5.  **Controle da Conversa:** Mantenha o foco. Se o usuário desviar do assunto, retorne-o educadamente ao processo de coleta de dados.
-    historico de mensagens: {messages}
-    """)
+    """
+
+
+#vamos fazer a mesma coisa só que agora com um agente de verdade
+def interview_node_with_tools(state: AgentState):
+    messages = state['messages']
     
-    response = llm_with_tools.invoke([system_msg] + messages)
+    cpf = state.get('cpf', 'não informado')
+
+    llm_with_tools = llm_para("entrevista").bind_tools(tools_entrevista)
+
+    response = invocar(llm_with_tools, "entrevista", PROMPT_ENTREVISTA, messages, {"cpf": cpf})
+
+    return {"messages": [response]}
+
+
+def eh_formulario_entrevista(message) -> bool:
+    return FORMULARIO_ENTREVISTA in getattr(message, "additional_kwargs", {})
+
+
+#modo formulario: os cinco dados chegam juntos e validados, então não precisa de LLM nenhum
+def interview_form_node(state: AgentState):
+    cpf = state.get('cpf')
+    if not state.get('authenticated') or not cpf:
+        return {"messages": [AIMessage(content="Para atualizar seu cadastro preciso primeiro confirmar sua identidade. Pode me informar seu CPF?")]}
+
+    profile = FinancialProfile(**state['messages'][-1].additional_kwargs[FORMULARIO_ENTREVISTA])
+    dados = profile.model_dump()
+    if any(valor is None for valor in dados.values()):
+        return {"messages": [AIMessage(content="O formulário veio incompleto. Por favor, preencha todos os campos e envie de novo.")]}
+
+    novo_score = calculate_score.invoke(dados)
+    audit_log.registrar("tool", cpf, tool="calculate_score", args=dados, resultado=str(novo_score), status="success")
+    sucesso = atualizar_score_cliente.invoke({"cpf": cpf, "novo_score": novo_score})
+    audit_log.registrar("tool", cpf, tool="atualizar_score_cliente", args={"cpf": cpf, "novo_score": novo_score},
+                        resultado=str(sucesso), status="success" if sucesso else "error")
+
+    if not sucesso:
+        return {"messages": [AIMessage(content="Ocorreu um erro técnico ao salvar seus dados. Por favor, contate o suporte.")]}
 
-    return {"messages": [response]}
\ No newline at end of file
+    update = {
+        "messages": [AIMessage(content=(
+            f"Obrigado pelas informações! Seu perfil foi atualizado com sucesso.\n\n"
+            f"📊 **Novo Score Calculado:** {novo_score}\n\n"
+            "Deseja reavaliar seu limite agora ou prefere encerrar o atendimento?"
+        ))],
+        "user_intent": "credito",
+    }
+    # a escrita foi nossa, então o snapshot é atualizado direto sem reler o csv
+    if state.get("cliente"):
+        update["cliente"] = {**state["cliente"], "score": novo_score}
+    return update
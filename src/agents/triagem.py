@@ -1,6 +1,7 @@
 from langchain_core.messages import AIMessage
+from src.graph.deadline import rodar_em_thread
 from src.tools.csv_handler import validar_cliente
-from src.graph.state import AgentState
+from src.graph.state import AgentState, snapshot_cliente
 from src.tools.utils import (
     extract_cpfs,
     extract_date,
@@ -9,6 +10,13 @@ from src.tools.utils import (
     end_conversation
 )
 
+
+def _descartar(future):
+    # resultado especulativo que não vai ser usado, se ainda nem começou nem roda
+    # (se já está rodando a thread dela termina sozinha quando a chamada voltar)
+    future.cancel()
+
+
 #quem comentou fui eu não a AI (colega de trabalho achou que fosse)
 def triagem_node(state: AgentState):
     #declarando as variaveis
@@ -19,10 +27,14 @@ def triagem_node(state: AgentState):
     system_feedback = ""
     intent = state.get("user_intent", "nenhum")
 
-    #verificando as inteções já que o usuario pode dar sua intenção na mensagem de oi
-    if intent != "end":
-        intent = extract_intent(messages)
-    
+    #a intenção só é usada depois de autenticado (ou sem tentativas), no login ela era calculada e jogada fora
+    #autenticado ela roda em paralelo com a resposta da triagem, que é descartada se o cliente for roteado
+    precisa_intencao = intent != "end" and (state.get('authenticated') or atempts <= 0)
+    resposta_future = None
+    if precisa_intencao and state.get('authenticated'):
+        system_feedback = f"Cliente já autenticado como: {state['nome']}"
+        # thread própria e não um pool: tempo na fila de um pool contava contra o prazo do turno
+        resposta_future = rodar_em_thread(get_llm_response, atempts, status_auth, system_feedback, last_message, messages)
 
     #estado de autenticação
     if not state.get('authenticated') and atempts > 0:
@@ -57,7 +69,8 @@ def triagem_node(state: AgentState):
                 return {"messages": [AIMessage(content=response.content)],
                         "authenticated": True,
                         "nome": user['nome'],
-                        "data_nascimento": data_nascimento
+                        "data_nascimento": data_nascimento,
+                        "cliente": snapshot_cliente(user)
                         }
             #estado de falha
             state['auth_attempts'] = state.get('auth_attempts', 0) + 1
@@ -81,18 +94,26 @@ def triagem_node(state: AgentState):
     
     #logica de roteamento
     #não usei else aqui porque não precisa, já cai aqui se o teste acima falha
+    paralelas = []
+    if precisa_intencao:
+        intent, paralelas = extract_intent(messages)
     if intent == "end":
         return {"user_intent": intent}
     if intent == "finalizado":
+        if resposta_future: _descartar(resposta_future)
         response = end_conversation(messages)
         intent = "end"
         return {"messages": [AIMessage(content=response.content)],
                 "user_intent": intent}
-    system_feedback = f"Cliente já autenticado como: {state['nome']}"
-    intent = extract_intent(messages)
+    #a segunda extração de intenção que tinha aqui usava exatamente as mesmas mensagens, reaproveitei a primeira
     if intent != "nenhum":
-        return {"user_intent": intent}
-    response = get_llm_response(atempts, status_auth, system_feedback, last_message, messages)
+        if resposta_future: _descartar(resposta_future)
+        return {"user_intent": intent, "intencoes": paralelas}
+    if resposta_future:
+        response = resposta_future.result()
+    else:
+        system_feedback = f"Cliente já autenticado como: {state['nome']}"
+        response = get_llm_response(atempts, status_auth, system_feedback, last_message, messages)
     return {"messages": [AIMessage(content=response.content)],
                 "user_intent": intent}
         
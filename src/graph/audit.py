@@ -0,0 +1,151 @@
+"""
+Log de auditoria das chamadas de tool e decisões de roteamento.
+
+O turno do chat só coloca o registro numa fila limitada (nunca bloqueia); uma thread em background
+empacota os registros em msgpack e grava segmentos comprimidos com zstd, rotacionando por tamanho
+ou tempo. Cada segmento fechado ganha uma entrada no índice (intervalo de tempo + CPFs), o que
+permite ao leitor abrir somente os segmentos que interessam.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+import ormsgpack
+import zstandard
+
+from src.graph.frames import append_frame, empacotar_frame, ler_frames, separar_frames
+from src.tools.cpf import limpar_cpf
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+AUDIT_DIR = os.path.join(BASE_DIR, 'data', 'audit')
+INDEX_FILE = "index.msgpack"
+
+class AuditLog:
+    def __init__(self, diretorio: str = AUDIT_DIR, max_bytes: int = 256 * 1024,
+                 max_segundos: float = 60.0, max_fila: int = 10_000):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self.max_segundos = max_segundos
+        self.descartados = 0
+        self._fila = queue.Queue(maxsize=max_fila)
+        self._segmento: list[bytes] = []
+        self._segmento_bytes = 0
+        self._segmento_inicio = time.monotonic()
+        self._t_min = None
+        self._t_max = None
+        self._cpfs: set[str] = set()
+        self._seq = 0
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        atexit.register(self.fechar)
+
+    def registrar(self, tipo: str, cpf: str | None = None, **dados):
+        """Enfileira um registro sem bloquear; se a fila estiver cheia o registro é descartado e contado."""
+        registro = {"ts": time.time(), "tipo": tipo, "cpf": cpf, **dados}
+        try:
+            self._fila.put_nowait(registro)
+        except queue.Full:
+            self.descartados += 1
+
+    def fechar(self):
+        if self._thread.is_alive():
+            self._fila.put(None)
+            self._thread.join()
+
+    def _loop(self):
+        while True:
+            try:
+                registro = self._fila.get(timeout=1.0)
+            except queue.Empty:
+                self._rotacionar_se_preciso()
+                continue
+            if registro is None:
+                self._rotacionar()
+                return
+            self._adicionar(registro)
+            self._rotacionar_se_preciso()
+
+    def _rotacionar_se_preciso(self):
+        if self._segmento_bytes >= self.max_bytes or (
+            self._segmento and time.monotonic() - self._segmento_inicio >= self.max_segundos
+        ):
+            self._rotacionar()
+
+    def _adicionar(self, registro: dict):
+        if not self._segmento:
+            self._segmento_inicio = time.monotonic()
+        payload = ormsgpack.packb(registro, default=str)
+        self._segmento.append(payload)
+        self._segmento_bytes += len(payload)
+        ts = registro["ts"]
+        self._t_min = ts if self._t_min is None else min(self._t_min, ts)
+        self._t_max = ts if self._t_max is None else max(self._t_max, ts)
+        if registro.get("cpf"):
+            self._cpfs.add(limpar_cpf(registro["cpf"]))
+
+    def _rotacionar(self):
+        if not self._segmento:
+            return
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._seq += 1
+        nome = f"{int(self._t_min * 1000)}-{os.getpid()}-{self._seq}.zst"  # type: ignore
+
+        corpo = b"".join(empacotar_frame(p) for p in self._segmento)
+        caminho = os.path.join(self.diretorio, nome)
+        with open(caminho + ".tmp", mode='wb') as f:
+            f.write(zstandard.ZstdCompressor(level=3).compress(corpo))
+        os.replace(caminho + ".tmp", caminho)
+
+        append_frame(os.path.join(self.diretorio, INDEX_FILE), ormsgpack.packb({
+            "segmento": nome,
+            "t_min": self._t_min,
+            "t_max": self._t_max,
+            "cpfs": sorted(self._cpfs),
+            "registros": len(self._segmento),
+        }))
+
+        self._segmento = []
+        self._segmento_bytes = 0
+        self._t_min = self._t_max = None
+        self._cpfs = set()
+
+
+def ler_auditoria(cpf: str | None = None, inicio: float | None = None, fim: float | None = None,
+                  diretorio: str = AUDIT_DIR):
+    """
+    Lê os registros filtrando por CPF e intervalo de tempo (timestamps unix).
+    Usa o índice para pular segmentos sem o CPF ou fora do intervalo, sem descomprimi-los.
+    """
+    caminho_indice = os.path.join(diretorio, INDEX_FILE)
+    if not os.path.exists(caminho_indice):
+        return
+
+    cpf_limpo = limpar_cpf(cpf) if cpf else None
+    decompressor = zstandard.ZstdDecompressor()
+
+    for frame in ler_frames(caminho_indice):
+        entrada = ormsgpack.unpackb(frame)
+        if inicio is not None and entrada["t_max"] < inicio:
+            continue
+        if fim is not None and entrada["t_min"] > fim:
+            continue
+        if cpf_limpo and cpf_limpo not in entrada["cpfs"]:
+            continue
+
+        with open(os.path.join(diretorio, entrada["segmento"]), mode='rb') as f:
+            corpo = decompressor.decompress(f.read())
+
+        for frame in separar_frames(corpo):
+            registro = ormsgpack.unpackb(frame)
+            if inicio is not None and registro["ts"] < inicio:
+                continue
+            if fim is not None and registro["ts"] > fim:
+                continue
+            if cpf_limpo and limpar_cpf(registro.get("cpf") or "") != cpf_limpo:
+                continue
+            yield registro
+
+
+audit_log = AuditLog()
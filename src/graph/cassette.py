@@ -0,0 +1,132 @@
+"""
+Modo cassete para o LLM: grava todas as chamadas ao modelo numa sessão e depois reproduz offline.
+
+    LLM_CASSETTE=record LLM_CASSETTE_FILE=data/cassettes/sessao.jsonl streamlit run app.py
+    LLM_CASSETTE=replay LLM_CASSETTE_FILE=data/cassettes/sessao.jsonl LLM_CASSETTE_LATENCIA=zero python ...
+
+A gravação acontece no `_generate` do ChatOpenAI, depois do bind_tools/with_structured_output,
+então tool calls e saídas estruturadas ficam na fita exatamente como o provedor devolveu.
+No replay a resposta é escolhida pelo hash da requisição; se a requisição mudou (ex: prompt
+diferente) cai na próxima resposta da fita em ordem e conta como divergência.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict, messages_to_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_openai import ChatOpenAI
+from pydantic import BaseModel
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+CASSETTE_DIR = os.path.join(BASE_DIR, 'data', 'cassettes')
+
+CASSETTE_MODE = os.getenv("LLM_CASSETTE", "").lower()  # "", "record" ou "replay"
+CASSETTE_FILE = os.getenv("LLM_CASSETTE_FILE", os.path.join(CASSETTE_DIR, "sessao.jsonl"))
+CASSETTE_LATENCIA = os.getenv("LLM_CASSETTE_LATENCIA", "original")  # "original" ou "zero"
+CASSETTE_STRICT = os.getenv("LLM_CASSETTE_STRICT", "") == "1"
+
+
+class CassetteMismatch(Exception):
+    pass
+
+
+def _hash_requisicao(model: str, messages: list[BaseMessage], kwargs: dict) -> str:
+    corpo = json.dumps({"model": model, "messages": messages_to_dict(messages), "kwargs": kwargs},
+                       sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(corpo.encode('utf-8')).hexdigest()
+
+
+def _serializar_resultado(result: ChatResult) -> dict:
+    generations = []
+    for gen in result.generations:
+        message = gen.message.model_copy(deep=True)
+        # o parser de saída estruturada aceita 'parsed' como dict, então guardamos o model_dump
+        parsed = message.additional_kwargs.get("parsed")
+        if isinstance(parsed, BaseModel):
+            message.additional_kwargs["parsed"] = parsed.model_dump()
+        generations.append({"message": message_to_dict(message), "generation_info": gen.generation_info})
+    return {"generations": generations, "llm_output": result.llm_output}
+
+
+def _desserializar_resultado(data: dict) -> ChatResult:
+    generations = [
+        ChatGeneration(message=messages_from_dict([gen["message"]])[0], generation_info=gen["generation_info"])
+        for gen in data["generations"]
+    ]
+    return ChatResult(generations=generations, llm_output=data["llm_output"])
+
+
+class Cassette:
+    def __init__(self, caminho: str, modo: str):
+        self.caminho = caminho
+        self.modo = modo
+        self.divergencias = 0
+        self._lock = threading.Lock()
+        self._por_hash = defaultdict(deque)
+        self._fila = deque()
+
+        if modo == "record":
+            os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        elif modo == "replay":
+            with open(caminho, mode='r', encoding='utf-8') as f:
+                for linha in f:
+                    if linha.strip():
+                        entrada = json.loads(linha)
+                        self._por_hash[entrada["hash"]].append(entrada)
+                        self._fila.append(entrada)
+
+    def gravar(self, hash_req: str, latencia: float, model: str, messages: list[BaseMessage], kwargs: dict, result: ChatResult):
+        entrada = {
+            "hash": hash_req,
+            "latencia": latencia,
+            "request": {"model": model, "messages": messages_to_dict(messages), "kwargs": kwargs},
+            "result": _serializar_resultado(result),
+        }
+        linha = json.dumps(entrada, default=str, ensure_ascii=False)
+        with self._lock, open(self.caminho, mode='a', encoding='utf-8') as f:
+            f.write(linha + "\n")
+
+    def reproduzir(self, hash_req: str) -> dict:
+        with self._lock:
+            if self._por_hash[hash_req]:
+                entrada = self._por_hash[hash_req].popleft()
+                self._fila.remove(entrada)
+                return entrada
+            if CASSETTE_STRICT or not self._fila:
+                raise CassetteMismatch(f"Nenhuma resposta gravada para a requisição {hash_req[:12]} em {self.caminho}")
+            self.divergencias += 1
+            entrada = self._fila.popleft()
+            self._por_hash[entrada["hash"]].remove(entrada)
+            return entrada
+
+
+cassette = Cassette(CASSETTE_FILE, CASSETTE_MODE) if CASSETTE_MODE else None
+
+
+class CassetteChatOpenAI(ChatOpenAI):
+    """ChatOpenAI que grava ou reproduz as respostas conforme LLM_CASSETTE."""
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        # o timeout muda a cada chamada (prazo restante do turno) e não faz parte da requisição em si
+        kwargs_req = {"stop": stop, **{k: v for k, v in kwargs.items() if k != "timeout"}}
+        hash_req = _hash_requisicao(self.model_name, messages, kwargs_req)
+
+        if cassette is None or cassette.modo != "replay":
+            inicio = time.perf_counter()
+            result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            if cassette is not None:
+                cassette.gravar(hash_req, time.perf_counter() - inicio, self.model_name, messages, kwargs_req, result)
+            return result
+
+        entrada = cassette.reproduzir(hash_req)
+        if CASSETTE_LATENCIA == "original":
+            time.sleep(entrada["latencia"])
+        return _desserializar_resultado(entrada["result"])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return await asyncio.to_thread(self._generate, messages, stop, None, **kwargs)
@@ -0,0 +1,145 @@
+"""
+Prazo por turno do chat.
+
+A triagem abre o turno e grava `turno_deadline` no estado; cada nó roda com esse prazo num contextvar,
+as chamadas de LLM e tools recebem o tempo restante como timeout e, se o prazo estoura (ou o loop de
+tools passa do limite), o nó devolve uma resposta padrão em vez de deixar o cliente esperando.
+"""
+import contextvars
+import inspect
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+from contextvars import ContextVar
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+
+
+TURNO_TIMEOUT_S = float(os.getenv("TURNO_TIMEOUT_S", "30"))
+MAX_RODADAS_TOOLS = int(os.getenv("MAX_RODADAS_TOOLS_POR_TURNO", "8"))
+# prazo mínimo que precisa sobrar para começar uma tool de escrita (depois de começada ela vai até o fim)
+RESERVA_ESCRITA_S = float(os.getenv("RESERVA_ESCRITA_S", "2"))
+
+RESPOSTA_FALLBACK = (
+    "Desculpe, não consegui concluir sua solicitação a tempo. "
+    "Pode repetir sua última mensagem em alguns instantes?"
+)
+
+
+class PrazoEsgotado(Exception):
+    pass
+
+
+_deadline: ContextVar[float | None] = ContextVar("deadline_turno", default=None)
+_lock = threading.Lock()
+_metricas = defaultdict(lambda: {"execucoes": 0, "estouros": 0, "loops_cortados": 0})
+
+
+def tempo_restante() -> float | None:
+    """Segundos até o fim do turno, ou None se o código está rodando fora de um turno com prazo."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.time()
+
+
+def prazo_esgotado(state) -> bool:
+    deadline = state.get("turno_deadline")
+    return deadline is not None and time.time() >= deadline
+
+
+def rodar_em_thread(fn, *args, **kwargs) -> Future:
+    """Roda fn numa thread própria (com o contexto atual copiado) e devolve um Future."""
+    # uma thread por chamada em vez de um pool fixo: com pool, o tempo na fila contava contra o prazo
+    # e o tamanho dele virava o limite de chamadas simultâneas do processo inteiro
+    future = Future()
+    contexto = contextvars.copy_context()
+
+    def alvo():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(contexto.run(fn, *args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=alvo, daemon=True).start()
+    return future
+
+
+def executar_com_prazo(fn, *args, **kwargs):
+    """
+    Roda fn respeitando o prazo do turno. Se o prazo acabar a espera é abandonada e PrazoEsgotado sobe,
+    mas fn continua rodando na thread dela até terminar, então não serve para escritas (ver
+    workflow.executar_tools). Para chamadas ao LLM não precisa disso: o timeout HTTP já limita a
+    requisição (ver prompts.invocar).
+    """
+    restante = tempo_restante()
+    if restante is None:
+        return fn(*args, **kwargs)
+    if restante <= 0:
+        raise PrazoEsgotado()
+    future = rodar_em_thread(fn, *args, **kwargs)
+    try:
+        return future.result(timeout=restante)
+    except FuturesTimeoutError:
+        raise PrazoEsgotado()
+
+
+def rodadas_de_tools(state) -> int:
+    """Quantas vezes o modelo pediu tools desde a última mensagem do cliente."""
+    rodadas = 0
+    for msg in reversed(state['messages']):
+        if isinstance(msg, HumanMessage):
+            break
+        if isinstance(msg, AIMessage) and msg.tool_calls:
+            rodadas += 1
+    return rodadas
+
+
+def _registrar(nome: str, campo: str):
+    with _lock:
+        _metricas[nome][campo] += 1
+
+
+def registrar_estouro(nome: str):
+    """Para nós que tratam o PrazoEsgotado por conta própria e o com_prazo não chega a ver."""
+    _registrar(nome, "estouros")
+
+
+def com_prazo(nome: str, node, inicia_turno: bool = False, limita_tools: bool = False):
+    """Envolve um nó do grafo com o prazo do turno e a resposta padrão em caso de estouro."""
+    aceita_config = len(inspect.signature(node).parameters) > 1
+
+    def wrapper(state, config: RunnableConfig):
+        deadline = state.get("turno_deadline")
+        messages = state['messages']
+        # um turno novo começa quando a triagem recebe a mensagem do cliente
+        if inicia_turno and messages and isinstance(messages[-1], HumanMessage):
+            deadline = time.time() + TURNO_TIMEOUT_S
+
+        _registrar(nome, "execucoes")
+        if limita_tools and rodadas_de_tools(state) >= MAX_RODADAS_TOOLS:
+            _registrar(nome, "loops_cortados")
+            return {"messages": [AIMessage(content=RESPOSTA_FALLBACK)]}
+
+        token = _deadline.set(deadline)
+        try:
+            update = node(state, config) if aceita_config else node(state)
+        except PrazoEsgotado:
+            _registrar(nome, "estouros")
+            update = {"messages": [AIMessage(content=RESPOSTA_FALLBACK)]}
+        finally:
+            _deadline.reset(token)
+
+        if inicia_turno:
+            update = {**update, "turno_deadline": deadline}
+        return update
+
+    wrapper.__name__ = getattr(node, "__name__", nome)
+    return wrapper
+
+
+def relatorio_prazos() -> dict:
+    with _lock:
+        return {nome: dict(valores) for nome, valores in _metricas.items()}
@@ -0,0 +1,35 @@
+"""
+Framing com prefixo de tamanho usado pelos arquivos binários da sessão (spill de mensagens e auditoria):
+cada frame é um inteiro de 4 bytes big-endian com o tamanho seguido do payload.
+"""
+import struct
+
+
+FRAME_HEADER = struct.Struct(">I")
+
+
+def empacotar_frame(payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def append_frame(caminho: str, payload: bytes):
+    with open(caminho, mode='ab') as f:
+        f.write(empacotar_frame(payload))
+
+
+def ler_frames(caminho: str):
+    """Payloads de um arquivo de frames, na ordem em que foram gravados."""
+    with open(caminho, mode='rb') as f:
+        while header := f.read(FRAME_HEADER.size):
+            (tamanho,) = FRAME_HEADER.unpack(header)
+            yield f.read(tamanho)
+
+
+def separar_frames(corpo: bytes):
+    """Mesmo que ler_frames, para um bloco de frames que já está em memória."""
+    offset = 0
+    while offset < len(corpo):
+        (tamanho,) = FRAME_HEADER.unpack_from(corpo, offset)
+        offset += FRAME_HEADER.size
+        yield corpo[offset:offset + tamanho]
+        offset += tamanho
@@ -1,3 +1,108 @@
+import os
+import threading
+import time
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_openai import ChatOpenAI
 
-llm = ChatOpenAI(model='gpt-5.1')
\ No newline at end of file
+from src.graph.cassette import CASSETTE_MODE, CassetteChatOpenAI
+
+
+# "rapido" para extração estruturada e roteamento, "grande" para falar com o cliente e agentes com tools
+TIERS = {
+    "rapido": {
+        "model": os.getenv("LLM_MODELO_RAPIDO", "gpt-5-mini"),
+        "reasoning_effort": os.getenv("LLM_ESFORCO_RAPIDO", "minimal"),
+    },
+    "grande": {
+        "model": os.getenv("LLM_MODELO_GRANDE", "gpt-5.1"),
+        "reasoning_effort": os.getenv("LLM_ESFORCO_GRANDE") or None,
+    },
+}
+
+# tier de cada chamada de LLM do projeto, pode ser trocado por env: LLM_TIER_EXTRACT_INTENT=grande
+CALL_SITES = {
+    "extract_intent": "rapido",
+    "extract_date": "rapido",
+    "user_request": "rapido",
+    "financial_profile": "rapido",
+    "triagem": "grande",
+    "end_conversation": "grande",
+    "cambio": "grande",
+    "credito": "grande",
+    "entrevista": "grande",
+}
+
+
+class LatenciaCallback(BaseCallbackHandler):
+    """Latência das chamadas ao modelo, agregada por tier."""
+
+    def __init__(self, tier: str):
+        self.tier = tier
+        self.chamadas = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+        self._inicio = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._inicio[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        inicio = self._inicio.pop(run_id, None)
+        if inicio is None:
+            return
+        ms = (time.perf_counter() - inicio) * 1000
+        with self._lock:
+            self.chamadas += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._inicio.pop(run_id, None)
+
+
+latencias = {tier: LatenciaCallback(tier) for tier in TIERS}
+
+
+def _criar_modelo(tier: str) -> ChatOpenAI:
+    config = TIERS[tier]
+    # sem retry no cliente: ele repetia a requisição com o mesmo timeout e ainda dormia no backoff,
+    # estourando o prazo do turno. Quem repete é o prompts.invocar, só enquanto sobra prazo
+    kwargs = {"model": config["model"], "callbacks": [latencias[tier]], "max_retries": 0}
+    if config["reasoning_effort"]:
+        kwargs["reasoning_effort"] = config["reasoning_effort"]
+
+    if CASSETTE_MODE == "replay":
+        # no replay nada vai para a rede, então a chave não precisa existir
+        return CassetteChatOpenAI(api_key=os.getenv("OPENAI_API_KEY") or "replay", **kwargs)
+    if CASSETTE_MODE == "record":
+        return CassetteChatOpenAI(**kwargs)
+    return ChatOpenAI(**kwargs)
+
+
+modelos = {tier: _criar_modelo(tier) for tier in TIERS}
+
+
+def tier_de(call_site: str) -> str:
+    return os.getenv(f"LLM_TIER_{call_site.upper()}", CALL_SITES.get(call_site, "grande"))
+
+
+def llm_para(call_site: str) -> ChatOpenAI:
+    """Modelo que o call site deve usar de acordo com o tier dele."""
+    return modelos[tier_de(call_site)]
+
+
+def relatorio_latencia() -> dict:
+    return {
+        tier: {
+            "modelo": TIERS[tier]["model"],
+            "chamadas": cb.chamadas,
+            "media_ms": cb.total_ms / cb.chamadas if cb.chamadas else 0.0,
+            "max_ms": cb.max_ms,
+        }
+        for tier, cb in latencias.items()
+    }
+
+
+# modelo padrão, mantido para quem ainda importa `llm` direto
+llm = modelos["grande"]
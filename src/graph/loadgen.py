@@ -0,0 +1,332 @@
+"""
+Gerador de carga para o grafo compilado (`src.graph.workflow.app`).
+
+Simula N clientes simultâneos com um roteiro fixo (login, pedido composto limite + cotação,
+aumento de limite, entrevista, cotação, despedida) contra um LLM falso com latência configurável, usando cópias temporárias dos CSVs.
+No final mostra vazão, latência por turno (p50/p95/p99), erros, atualizações perdidas nos
+arquivos de dados e pico de RSS.
+
+    python -m src.graph.loadgen --clientes 200 --concorrencia 50 --latencia-ms 400 --distribuicao lognormal
+    python -m src.graph.loadgen --clientes 200 --concorrencia 50 --storage   # via daemon de escrita única
+"""
+import argparse
+import ast
+import csv
+import json
+import os
+import random
+import re
+import resource
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_openai import ChatOpenAI
+
+from src.tools.cpf import limpar_cpf
+
+
+NOVO_LIMITE = 3000.0
+PERFIL = {"monthly_income": 5000.0, "employment_type": "formal", "monthly_expenses": 2000.0,
+          "dependents": 1, "has_active_debt": False}
+
+
+def roteiro(cpf: str, data_nascimento: str) -> list[str]:
+    return [
+        f"oi, meu cpf é {cpf}",
+        f"nasci em {data_nascimento}",
+        "qual meu limite e quanto está o dólar?",
+        f"quero aumento de limite para {NOVO_LIMITE:.0f}",
+        "quero fazer a entrevista para melhorar meu score",
+        "minha renda é 5000, sou CLT, tenho 2000 de despesas, 1 dependente e não tenho dívidas",
+        "quanto está o dólar hoje?",
+        "tchau, obrigado",
+    ]
+
+
+def gerar_cpf(rng: random.Random) -> str:
+    base = [rng.randint(0, 9) for _ in range(9)]
+    for peso_inicial in (10, 11):
+        soma = sum(d * (peso_inicial - i) for i, d in enumerate(base))
+        digito = soma * 10 % 11
+        base.append(0 if digito == 10 else digito)
+    cpf = "".join(map(str, base))
+    return f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
+
+
+# LLM falso
+
+def _amostrar_latencia(media_ms: float, distribuicao: str) -> float:
+    if media_ms <= 0:
+        return 0.0
+    if distribuicao == "fixa":
+        return media_ms / 1000
+    if distribuicao == "exponencial":
+        return random.expovariate(1000 / media_ms)
+    # lognormal com sigma 0.5 e a mesma média
+    return random.lognormvariate(0, 0.5) * media_ms / 1000 / 1.1331
+
+
+def _conteudo_tool(conteudo):
+    try:
+        return json.loads(conteudo)
+    except (TypeError, ValueError):
+        try:
+            return ast.literal_eval(conteudo)
+        except (ValueError, SyntaxError):
+            return conteudo
+
+
+def _intencao(texto: str) -> str:
+    texto = texto.lower()
+    if "tchau" in texto:
+        return "finalizado"
+    if "entrevista" in texto or "renda" in texto:
+        return "entrevista"
+    if "dólar" in texto or "cotação" in texto:
+        return "cambio"
+    if "limite" in texto:
+        return "credito"
+    return "nenhum"
+
+
+class FakeChatOpenAI(ChatOpenAI):
+    """Responde de forma roteirizada sem rede; decide pelo schema/tools pedidos e pelo histórico."""
+
+    latencia_ms: float = 0.0
+    distribuicao: str = "lognormal"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(_amostrar_latencia(self.latencia_ms, self.distribuicao))
+        return ChatResult(generations=[ChatGeneration(message=self._responder(messages, kwargs))])
+
+    def _responder(self, messages, kwargs) -> AIMessage:
+        ultima_humana = max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage))
+        texto = messages[ultima_humana].content
+        feitos = {m.name: _conteudo_tool(m.content) for m in messages[ultima_humana:] if isinstance(m, ToolMessage)}
+        contexto = {}
+        for m in messages:
+            if isinstance(m, SystemMessage) and m.content.startswith("# CONTEXTO ATUAL"):
+                contexto = json.loads(m.content.split("\n", 1)[1])
+
+        schema = kwargs.get("response_format")
+        if isinstance(schema, type):
+            if schema.__name__ == "UserIntent":
+                parsed = {"user_intent": _intencao(texto)}
+                if parsed["user_intent"] == "cambio" and "limite" in texto:
+                    parsed["intencoes_paralelas"] = ["credito", "cambio"]
+            elif schema.__name__ == "UserDate":
+                data = re.search(r"\d{4}-\d{2}-\d{2}", texto)
+                parsed = {"data_nascimento": data.group() if data else None}
+            else:
+                parsed = {campo: None for campo in schema.model_fields}
+            return AIMessage(content=json.dumps(parsed), additional_kwargs={"parsed": parsed})
+
+        tools = {t["function"]["name"] for t in kwargs.get("tools", [])}
+        cpf = contexto.get("cpf")
+
+        if "cotacao_serpapi" in tools and "cotacao_serpapi" not in feitos:
+            return _chamar("cotacao_serpapi", moeda="USD")
+
+        if "calculate_score" in tools and "renda" in texto:
+            if "calculate_score" not in feitos:
+                return _chamar("calculate_score", **PERFIL)
+            if "atualizar_score_cliente" not in feitos:
+                return _chamar("atualizar_score_cliente", cpf=cpf, novo_score=int(feitos["calculate_score"]))
+
+        if "buscar_dados_cliente" in tools:
+            valor = re.search(r"limite para (\d+)", texto)
+            if "buscar_dados_cliente" not in feitos:
+                return _chamar("buscar_dados_cliente", cpf=cpf)
+            if valor:
+                dados = feitos["buscar_dados_cliente"]
+                if "registrar_solicitacao" not in feitos:
+                    return _chamar("registrar_solicitacao", cpf=cpf, limite_atual=float(dados["limite_atual"]),
+                                   novo_limite=float(valor.group(1)), status="pendente")
+                if "verificar_elegibilidade_aumento" not in feitos:
+                    return _chamar("verificar_elegibilidade_aumento", score_atual=int(dados["score"]),
+                                   novo_limite=float(valor.group(1)))
+                if "processar_aprovacao_limite" not in feitos:
+                    aprovado = feitos["verificar_elegibilidade_aumento"] in (True, "true", "True")
+                    return _chamar("processar_aprovacao_limite", cpf=cpf, novo_status="aprovado" if aprovado else "rejeitado")
+
+        return AIMessage(content="Certo! Posso ajudar em algo mais?")
+
+
+def _chamar(nome: str, **args) -> AIMessage:
+    return AIMessage(content="", tool_calls=[{"id": f"call_{uuid.uuid4().hex[:12]}", "name": nome, "args": args}])
+
+
+# execução
+
+def _preparar_dados(diretorio: str, quantidade: int, rng: random.Random) -> list[dict]:
+    from src.tools import csv_handler
+
+    shutil.copy(csv_handler.SCORE_LIMITE_CSV, os.path.join(diretorio, "score_limite.csv"))
+    clientes = []
+    vistos = set()
+    while len(clientes) < quantidade:
+        cpf = gerar_cpf(rng)
+        if cpf in vistos:
+            continue
+        vistos.add(cpf)
+        clientes.append({
+            "cpf": cpf,
+            "data_nascimento": f"{rng.randint(1950, 2004)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "nome": f"Cliente {len(clientes)}",
+            "score": str(rng.randint(100, 900)),
+            "limite_atual": "1000.00",
+        })
+    with open(os.path.join(diretorio, "clientes.csv"), mode='w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(clientes[0]))
+        writer.writeheader()
+        writer.writerows(clientes)
+    with open(os.path.join(diretorio, "solicitacoes_aumento_limite.csv"), mode='w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerow(['cpf_cliente', 'data_hora_solicitacao', 'limite_atual', 'novo_limite_solicitado', 'status_pedido'])
+
+    csv_handler.CLIENTES_CSV = os.path.join(diretorio, "clientes.csv")
+    csv_handler.SCORE_LIMITE_CSV = os.path.join(diretorio, "score_limite.csv")
+    csv_handler.SOLICITACOES_CSV = os.path.join(diretorio, "solicitacoes_aumento_limite.csv")
+    return clientes
+
+
+def _contar_atualizacoes_perdidas(clientes: list[dict]) -> dict:
+    from src.tools import csv_handler
+    from src.tools.utils import calculate_score
+
+    score_esperado = calculate_score.func(**PERFIL)  # type: ignore
+    with open(csv_handler.CLIENTES_CSV, mode='r', encoding='utf-8') as f:
+        finais = {row['cpf']: row for row in csv.DictReader(f)}
+    with open(csv_handler.SOLICITACOES_CSV, mode='r', encoding='utf-8') as f:
+        solicitacoes = {}
+        for row in csv.DictReader(f):
+            solicitacoes.setdefault(limpar_cpf(row['cpf_cliente']), []).append(row)
+
+    perdidas = {"score": 0, "limite": 0, "solicitacao": 0, "clientes_sumidos": 0}
+    for cliente in clientes:
+        final = finais.get(cliente["cpf"])
+        if final is None:
+            perdidas["clientes_sumidos"] += 1
+            continue
+        if int(final["score"]) != score_esperado:
+            perdidas["score"] += 1
+        aprovado = csv_handler.verificar_elegibilidade_aumento.func(int(cliente["score"]), NOVO_LIMITE)  # type: ignore
+        limite_esperado = NOVO_LIMITE if aprovado else float(cliente["limite_atual"])
+        if float(final["limite_atual"]) != limite_esperado:
+            perdidas["limite"] += 1
+        linhas = solicitacoes.get(limpar_cpf(cliente["cpf"]), [])
+        status_esperado = "aprovado" if aprovado else "rejeitado"
+        if len(linhas) != 1 or linhas[0]["status_pedido"] != status_esperado:
+            perdidas["solicitacao"] += 1
+    return perdidas
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def executar(clientes_total: int, concorrencia: int, latencia_ms: float, distribuicao: str,
+             usar_storage: bool = False, seed: int = 42) -> dict:
+    # o import do llm cria os ChatOpenAI reais antes de serem trocados pelo falso e eles exigem uma chave
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    from src.graph import llm as llm_module
+    from src.graph.audit import audit_log
+    from src.graph.memory import memoria_residente
+
+    os.environ.pop("SERPAPI_KEY", None)
+    diretorio = tempfile.mkdtemp(prefix="loadgen-")
+    audit_log.diretorio = os.path.join(diretorio, "audit")
+    for tier in llm_module.modelos:
+        llm_module.modelos[tier] = FakeChatOpenAI(model=f"fake-{tier}", api_key="fake",
+                                                   latencia_ms=latencia_ms, distribuicao=distribuicao)
+
+    clientes = _preparar_dados(diretorio, clientes_total, random.Random(seed))
+
+    servidor = service = None
+    if usar_storage:
+        from src.tools import csv_handler, storage_service
+
+        service = storage_service.StorageService(csv_handler.CLIENTES_CSV, csv_handler.SOLICITACOES_CSV, 0.2)
+        socket_path = os.path.join(diretorio, "storage.sock")
+        servidor = storage_service._Server(socket_path, storage_service._Handler)
+        servidor.operacoes = service.operacoes()  # type: ignore
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        threading.Thread(target=service.loop_flush, daemon=True).start()
+        csv_handler.STORAGE_SOCKET = socket_path
+
+    from src.graph.workflow import app
+
+    latencias = []
+    erros = []
+    tamanhos_estado = []
+    lock = threading.Lock()
+
+    def sessao(cliente):
+        state = {"messages": [], "auth_attempts": 0, "authenticated": False, "cpf": None}
+        for texto in roteiro(cliente["cpf"], cliente["data_nascimento"]):
+            state["messages"].append(HumanMessage(content=texto))
+            inicio = time.perf_counter()
+            try:
+                state = app.invoke(state)
+            except Exception as e:
+                with lock:
+                    erros.append(f"{type(e).__name__}: {e}")
+                return
+            finally:
+                with lock:
+                    latencias.append(time.perf_counter() - inicio)
+        with lock:
+            tamanhos_estado.append(memoria_residente(state))
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(sessao, clientes))
+    duracao = time.perf_counter() - inicio
+
+    if service is not None:
+        service.parar()
+        servidor.shutdown()  # type: ignore
+
+    return {
+        "clientes": clientes_total,
+        "concorrencia": concorrencia,
+        "turnos": len(latencias),
+        "duracao_s": duracao,
+        "turnos_por_segundo": len(latencias) / duracao if duracao else 0.0,
+        "latencia_turno_ms": {
+            "p50": _percentil(latencias, 50) * 1000,
+            "p95": _percentil(latencias, 95) * 1000,
+            "p99": _percentil(latencias, 99) * 1000,
+        },
+        "erros": len(erros),
+        "exemplos_de_erro": sorted(set(erros))[:5],
+        "atualizacoes_perdidas": _contar_atualizacoes_perdidas(clientes),
+        "estado_medio_kb": sum(tamanhos_estado) / len(tamanhos_estado) / 1024 if tamanhos_estado else 0.0,
+        "pico_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "dados": diretorio,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga de clientes simultâneos contra o grafo com LLM falso.")
+    parser.add_argument("--clientes", type=int, default=100)
+    parser.add_argument("--concorrencia", type=int, default=20)
+    parser.add_argument("--latencia-ms", type=float, default=300.0, help="latência média de cada chamada ao LLM falso")
+    parser.add_argument("--distribuicao", choices=["fixa", "exponencial", "lognormal"], default="lognormal")
+    parser.add_argument("--storage", action="store_true", help="escreve através do daemon de escrita única")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    resultado = executar(args.clientes, args.concorrencia, args.latencia_ms, args.distribuicao, args.storage, args.seed)
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import sys
+import ormsgpack
+import zstandard
+from langchain_core.messages import BaseMessage, HumanMessage, messages_from_dict, messages_to_dict
+
+from src.graph.frames import append_frame, ler_frames
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+SPILL_DIR = os.path.join(BASE_DIR, 'data', 'spill')
+
+# limite de mensagens que ficam vivas na sessão, o resto vai para o disco
+MAX_MENSAGENS = int(os.getenv("MEMORIA_MAX_MENSAGENS", "40"))
+
+
+def _caminho_spill(session_id: str) -> str:
+    return os.path.join(SPILL_DIR, f"{session_id}.msgpack.zst")
+
+
+def _ponto_de_corte(messages: list[BaseMessage], limite: int) -> int:
+    """
+    Indice da primeira mensagem que continua residente.
+    O corte sempre cai numa HumanMessage para não separar uma chamada de tool das suas ToolMessages.
+    """
+    if len(messages) <= limite:
+        return 0
+    corte = len(messages) - limite
+    while corte < len(messages) and not isinstance(messages[corte], HumanMessage):
+        corte += 1
+    return corte if corte < len(messages) else 0
+
+
+def spill_mensagens(session_id: str, messages: list[BaseMessage]):
+    """Acrescenta as mensagens ao arquivo da sessão como um frame msgpack comprimido com zstd."""
+    if not messages:
+        return
+    os.makedirs(SPILL_DIR, exist_ok=True)
+    payload = ormsgpack.packb(messages_to_dict(messages), default=str)
+    frame = zstandard.ZstdCompressor(level=3).compress(payload)
+    append_frame(_caminho_spill(session_id), frame)
+
+
+def carregar_mensagens(session_id: str) -> list[BaseMessage]:
+    """Recarrega do disco todas as mensagens que já saíram da memória, na ordem original."""
+    caminho = _caminho_spill(session_id)
+    if not os.path.exists(caminho):
+        return []
+
+    messages = []
+    decompressor = zstandard.ZstdDecompressor()
+    for frame in ler_frames(caminho):
+        messages.extend(messages_from_dict(ormsgpack.unpackb(decompressor.decompress(frame))))
+    return messages
+
+
+def apagar_spill(session_id: str):
+    caminho = _caminho_spill(session_id)
+    if os.path.exists(caminho):
+        os.remove(caminho)
+
+
+def compactar_mensagens(session_id: str, messages: list[BaseMessage], limite: int = MAX_MENSAGENS):
+    """
+    Mantém no máximo ~limite mensagens em memória e manda as mais antigas para o disco.
+    Retorna (mensagens_residentes, quantidade_enviada_para_o_disco).
+    """
+    corte = _ponto_de_corte(messages, limite)
+    if corte == 0:
+        return messages, 0
+    spill_mensagens(session_id, messages[:corte])
+    return messages[corte:], corte
+
+
+def _tamanho(obj, vistos=None) -> int:
+    if vistos is None:
+        vistos = set()
+    if id(obj) in vistos:
+        return 0
+    vistos.add(id(obj))
+
+    tamanho = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        tamanho += sum(_tamanho(k, vistos) + _tamanho(v, vistos) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        tamanho += sum(_tamanho(item, vistos) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        tamanho += _tamanho(vars(obj), vistos)
+    return tamanho
+
+
+def memoria_residente(*objetos) -> int:
+    """Tamanho aproximado em bytes do que a sessão mantém vivo em memória (estado do grafo, cache de exibição...)."""
+    vistos = set()
+    return sum(_tamanho(obj, vistos) for obj in objetos)
@@ -0,0 +1,108 @@
+"""
+Montagem dos prompts pensando no cache de prefixo do provedor.
+
+A ordem é sempre: prompt estático (identidade, regras; as tools já vão antes no request) ->
+histórico de mensagens (só cresce no final) -> bloco de contexto dinâmico compacto.
+Assim o começo da requisição é idêntico byte a byte entre turnos e o provedor reaproveita o cache.
+"""
+import json
+import os
+import threading
+import time
+import openai
+from collections import defaultdict
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage, SystemMessage
+
+from src.graph.deadline import PrazoEsgotado, tempo_restante
+
+
+# os modelos são criados com max_retries=0, as novas tentativas ficam aqui para respeitarem o prazo
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+_ERROS_TRANSITORIOS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+
+def bloco_contexto(contexto: dict) -> SystemMessage:
+    """Estado dinâmico do turno em JSON compacto, sempre no final da requisição."""
+    corpo = json.dumps(contexto, ensure_ascii=False, separators=(",", ":"), default=str)
+    return SystemMessage(content=f"# CONTEXTO ATUAL\n{corpo}")
+
+
+def montar_mensagens(prompt_estatico: str, messages: list, contexto: dict | None = None) -> list[BaseMessage]:
+    mensagens = [SystemMessage(content=prompt_estatico)] + list(messages)
+    if contexto:
+        mensagens.append(bloco_contexto(contexto))
+    return mensagens
+
+
+class UsoCacheCallback(BaseCallbackHandler):
+    """Acumula tokens de entrada e tokens servidos do cache por call site (metadata 'call_site')."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._call_sites = {}
+        self.uso = defaultdict(lambda: {"chamadas": 0, "input_tokens": 0, "cached_tokens": 0})
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        with self._lock:
+            self._call_sites[run_id] = (metadata or {}).get("call_site", "desconhecido")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            call_site = self._call_sites.pop(run_id, "desconhecido")
+            for geracoes in response.generations:
+                for gen in geracoes:
+                    usage = getattr(getattr(gen, "message", None), "usage_metadata", None)
+                    if not usage:
+                        continue
+                    uso = self.uso[call_site]
+                    uso["chamadas"] += 1
+                    uso["input_tokens"] += usage.get("input_tokens", 0)
+                    uso["cached_tokens"] += usage.get("input_token_details", {}).get("cache_read", 0) or 0
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._call_sites.pop(run_id, None)
+
+
+uso_cache = UsoCacheCallback()
+
+
+def invocar(runnable, call_site: str, prompt_estatico: str, messages: list, contexto: dict | None = None):
+    """
+    Monta o prompt no layout amigável ao cache e invoca registrando o uso no call site.
+    Dentro de um turno com prazo, o tempo restante vira o timeout da requisição ao provedor, então a
+    chamada roda na própria thread do nó e um estouro do timeout vira PrazoEsgotado.
+    Erros transitórios são repetidos até LLM_MAX_RETRIES vezes, cada tentativa só com o prazo que sobrou.
+    """
+    mensagens = montar_mensagens(prompt_estatico, messages, contexto)
+    for tentativa in range(LLM_MAX_RETRIES + 1):
+        restante = tempo_restante()
+        if restante is not None and restante <= 0:
+            raise PrazoEsgotado()
+        kwargs = {"timeout": restante} if restante is not None else {}
+        try:
+            return runnable.invoke(
+                mensagens,
+                config={"callbacks": [uso_cache], "metadata": {"call_site": call_site}},
+                **kwargs,
+            )
+        except Exception as e:
+            restante = tempo_restante()
+            if restante is not None and restante <= 0:
+                raise PrazoEsgotado() from e
+            if not isinstance(e, _ERROS_TRANSITORIOS) or tentativa == LLM_MAX_RETRIES:
+                raise
+            espera = 0.5 * 2 ** tentativa
+            if restante is not None and espera >= restante:
+                raise PrazoEsgotado() from e
+            time.sleep(espera)
+
+
+def relatorio_cache() -> dict:
+    """Proporção de tokens de entrada que vieram do cache, por call site."""
+    with uso_cache._lock:
+        return {
+            call_site: {**uso, "cache_ratio": uso["cached_tokens"] / uso["input_tokens"] if uso["input_tokens"] else 0.0}
+            for call_site, uso in uso_cache.uso.items()
+        }
@@ -0,0 +1,41 @@
+from langchain_core.messages import ToolMessage
+
+from src.graph.state import snapshot_cliente
+from src.tools.csv_handler import carregar_cliente
+
+
+# tools que podem alterar a linha do cliente em clientes.csv
+ESCRITAS_CLIENTE = {"atualizar_score_cliente", "processar_aprovacao_limite"}
+
+
+def _alterou_cliente(tool_msg, args: dict) -> bool:
+    if tool_msg.name not in ESCRITAS_CLIENTE or tool_msg.status == "error":
+        return False
+    # rejeição só muda o status da solicitação, o limite do cliente fica igual
+    if tool_msg.name == "processar_aprovacao_limite":
+        return str(args.get("novo_status", "")).lower().strip() == "aprovado"
+    return True
+
+
+def renovar_snapshot(state) -> dict:
+    """
+    Se as tools que acabaram de rodar escreveram no cliente autenticado, relê a linha dele uma vez.
+    Retorna a atualização de estado ({"cliente": ...}) ou {} se nada mudou.
+    Chamado no passo de tools logo depois da escrita, assim o snapshot não depende do próximo nó rodar.
+    """
+    cliente = state.get("cliente")
+    if not cliente:
+        return {}
+
+    messages = state['messages']
+    tool_messages = []
+    i = len(messages) - 1
+    while i >= 0 and isinstance(messages[i], ToolMessage):
+        tool_messages.append(messages[i])
+        i -= 1
+    chamadas = {call['id']: call for call in getattr(messages[i], 'tool_calls', [])} if i >= 0 else {}
+    if not any(_alterou_cliente(msg, chamadas.get(msg.tool_call_id, {}).get('args', {})) for msg in tool_messages):
+        return {}
+
+    row = carregar_cliente(cliente["cpf"])
+    return {"cliente": snapshot_cliente(row)} if row else {}
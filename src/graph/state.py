@@ -2,6 +2,33 @@ import operator
 from typing import TypedDict, Annotated, List, Optional
 from langchain_core.messages import BaseMessage
 
+class ClienteSnapshot(TypedDict):
+    """
+    Dados do cliente autenticado guardados na sessão.
+    Evita reler o clientes.csv a cada consulta; é renovado depois de cada escrita desse cliente.
+    """
+    cpf: str
+    nome: str
+    score: int
+    limite_atual: float
+
+
+def snapshot_cliente(row: dict) -> ClienteSnapshot:
+    return {
+        "cpf": row['cpf'],
+        "nome": row['nome'],
+        "score": int(row['score']),
+        "limite_atual": float(row['limite_atual']),
+    }
+
+
+def juntar_respostas(atual: list | None, novo: list | None) -> list:
+    # None limpa a lista depois que as respostas dos ramos foram unidas
+    if novo is None:
+        return []
+    return (atual or []) + novo
+
+
 class AgentState(TypedDict):
     """
     Estado compartilhado entre os agentes do LangGraph.
@@ -19,3 +46,13 @@ class AgentState(TypedDict):
     auth_attempts: int
 
     user_intent: str
+
+    # Cliente autenticado (score, limite e nome)
+    cliente: Optional[ClienteSnapshot]
+
+    # Pedido composto: departamentos atendidos em paralelo neste turno e as respostas de cada um
+    intencoes: Optional[List[str]]
+    respostas_paralelas: Annotated[List[tuple], juntar_respostas]
+
+    # Prazo do turno atual (timestamp unix), definido pela triagem
+    turno_deadline: Optional[float]
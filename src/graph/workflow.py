@@ -1,25 +1,140 @@
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.types import Send
+from langchain_core.messages import AIMessage, ToolMessage
 
 from src.graph.state import AgentState
+from src.graph.audit import audit_log
+from src.graph.snapshot import ESCRITAS_CLIENTE, renovar_snapshot
+from src.graph.deadline import (MAX_RODADAS_TOOLS, RESERVA_ESCRITA_S, RESPOSTA_FALLBACK, PrazoEsgotado, com_prazo,
+                                 executar_com_prazo, prazo_esgotado, registrar_estouro, tempo_restante)
 from src.agents.triagem import triagem_node
 from src.agents.cambio import cambio_node, tools_cambio
 from src.agents.credito import credit_node_with_tools, tools_credito
-from src.agents.entrevista import interview_node_with_tools, tools_entrevista
+from src.agents.entrevista import interview_node_with_tools, interview_form_node, eh_formulario_entrevista, tools_entrevista
 
 graph_builder = StateGraph(AgentState)
 
-graph_builder.add_node("triagem", triagem_node)
-graph_builder.add_node("cambio", cambio_node)
-graph_builder.add_node("credito", credit_node_with_tools)
-graph_builder.add_node("entrevista", interview_node_with_tools)
+graph_builder.add_node("triagem", com_prazo("triagem", triagem_node, inicia_turno=True))
+graph_builder.add_node("cambio", com_prazo("cambio", cambio_node, limita_tools=True))
+graph_builder.add_node("credito", com_prazo("credito", credit_node_with_tools, limita_tools=True))
+graph_builder.add_node("entrevista", com_prazo("entrevista", interview_node_with_tools, limita_tools=True))
+graph_builder.add_node("formulario", com_prazo("formulario", interview_form_node, inicia_turno=True))
 
 all_tools = tools_cambio + tools_credito + tools_entrevista
 tool_node = ToolNode(all_tools)
-graph_builder.add_node("tools", tool_node)
-graph_builder.add_edge(START, "triagem")
+
+TOOLS_DE_ESCRITA = ESCRITAS_CLIENTE | {"registrar_solicitacao"}
+
+def executar_tools(state, config):
+    chamadas = state['messages'][-1].tool_calls
+    try:
+        if any(call['name'] in TOOLS_DE_ESCRITA for call in chamadas):
+            # escrita não pode ser abandonada no meio (o cliente ouviria "falhou" com o dado já gravado e uma
+            # nova tentativa duplicaria a solicitação): só começa se o prazo cobre e, começada, vai até o fim
+            restante = tempo_restante()
+            if restante is not None and restante < RESERVA_ESCRITA_S:
+                raise PrazoEsgotado()
+            resultado = tool_node.invoke(state, config)
+        else:
+            resultado = executar_com_prazo(tool_node.invoke, state, config)
+    except PrazoEsgotado:
+        # o com_prazo não vê esse estouro porque ele é tratado aqui, então registra na mão
+        registrar_estouro("tools")
+        # toda tool call precisa de uma resposta, senão o provedor recusa o historico no proximo turno
+        return {"messages": [
+            ToolMessage(content="Erro: tempo do atendimento esgotado, a operação não foi executada.", tool_call_id=call['id'], name=call['name'], status="error")
+            for call in chamadas
+        ]}
+    # write-through: se uma tool escreveu no cliente o snapshot é renovado aqui mesmo
+    atualizacao = renovar_snapshot({**state, "messages": state['messages'] + resultado["messages"]})
+    return {**resultado, **atualizacao}
+
+graph_builder.add_node("tools", com_prazo("tools", executar_tools))
+
+# o formulário da entrevista já chega estruturado, então pula a triagem (e as chamadas de LLM dela)
+def entrada(state):
+    messages = state['messages']
+    if messages and eh_formulario_entrevista(messages[-1]):
+        return "formulario"
+    return "triagem"
+
+graph_builder.add_conditional_edges(START, entrada, {"formulario": "formulario", "triagem": "triagem"})
+graph_builder.add_edge("formulario", END)
+
+# pedido composto ("qual meu limite e quanto está o euro?"): cada departamento roda num ramo paralelo
+# com o proprio loop agente -> tools sobre uma copia local das mensagens, assim as tool calls de um
+# ramo não se misturam com as do outro. O nó juntar une as respostas finais numa mensagem só.
+AGENTES_PARALELOS = {
+    "credito": credit_node_with_tools,
+    "cambio": cambio_node,
+}
+
+# vai no bloco de contexto de cada ramo: os dois recebem a mensagem composta inteira e, sem isso, um
+# desviava a pergunta do outro ou se despedia no meio da resposta juntada
+ESCOPO_RAMO = {
+    "credito": "Responda somente a parte do pedido sobre limite e crédito. A parte de câmbio é respondida "
+               "em paralelo por outro atendente: não comente, não desvie e não encerre a conversa.",
+    "cambio": "Responda somente a parte do pedido sobre cotação de moedas. A parte de limite e crédito é "
+              "respondida em paralelo por outro atendente: não comente, não desvie e não encerre a conversa.",
+}
+
+def ramo_paralelo(state, config):
+    departamento = state["departamento"]
+    agente = AGENTES_PARALELOS[departamento]
+    local = {**state, "messages": list(state["messages"]), "escopo": ESCOPO_RAMO[departamento]}
+    novas = []
+    atualizacao = {}
+
+    for _ in range(MAX_RODADAS_TOOLS + 1):
+        try:
+            update = agente(local)
+        except PrazoEsgotado:
+            # o estouro fica no ramo (e não no com_prazo) para o juntar mandar um fallback só e as tools
+            # que já rodaram continuarem no histórico
+            registrar_estouro("ramo")
+            return {"messages": novas, "respostas_paralelas": [(departamento, RESPOSTA_FALLBACK)], **atualizacao}
+        resposta = update["messages"][-1]
+        if not resposta.tool_calls:
+            return {"messages": novas, "respostas_paralelas": [(departamento, resposta.content)], **atualizacao}
+        resultado = executar_tools({**local, "messages": local["messages"] + [resposta]}, config)
+        if "cliente" in resultado:
+            atualizacao["cliente"] = local["cliente"] = resultado["cliente"]
+        novas += [resposta] + resultado["messages"]
+        local["messages"] = local["messages"] + [resposta] + resultado["messages"]
+        auditar_tools(local)
+    return {"messages": novas, "respostas_paralelas": [(departamento, RESPOSTA_FALLBACK)], **atualizacao}
+
+def juntar_ramos(state):
+    ordem = state.get("intencoes") or []
+    respostas = sorted(state.get("respostas_paralelas") or [], key=lambda r: ordem.index(r[0]) if r[0] in ordem else len(ordem))
+    textos = [texto for _, texto in respostas if texto]
+    # dois ramos que estouraram o prazo devolvem o mesmo fallback, que aparece uma vez só
+    if textos.count(RESPOSTA_FALLBACK) > 1:
+        textos = [texto for texto in textos if texto != RESPOSTA_FALLBACK] + [RESPOSTA_FALLBACK]
+    conteudo = "\n\n".join(textos)
+    update = {"respostas_paralelas": None, "intencoes": []}
+    if conteudo:
+        update["messages"] = [AIMessage(content=conteudo)]
+    return update
+
+graph_builder.add_node("ramo", com_prazo("ramo", ramo_paralelo))
+graph_builder.add_node("juntar", juntar_ramos)
+graph_builder.add_edge("ramo", "juntar")
+graph_builder.add_edge("juntar", END)
 
 def router(state):
+    intencoes = state.get("intencoes") or []
+    if len(intencoes) > 1 and not prazo_esgotado(state):
+        audit_log.registrar("roteamento", state.get("cpf"), no="triagem", intent=state.get("user_intent"), destino=intencoes)
+        return [Send("ramo", {**state, "departamento": departamento}) for departamento in intencoes]
+    destino = _router(state)
+    audit_log.registrar("roteamento", state.get("cpf"), no="triagem", intent=state.get("user_intent"), destino=destino)
+    return destino
+
+def _router(state):
+    if prazo_esgotado(state):
+        return END
     intent = state.get("user_intent")
     if intent == "end": 
         return END
@@ -40,6 +155,7 @@ graph_builder.add_conditional_edges(
         "cambio": "cambio",
         "credito": "credito",
         "entrevista": "entrevista",
+        "ramo": "ramo",
         END: END
     }
 )
@@ -62,7 +178,27 @@ graph_builder.add_conditional_edges(
     }
 )
 
+def auditar_tools(state):
+    messages = state['messages']
+    tool_messages = []
+    i = len(messages) - 1
+    while i >= 0 and isinstance(messages[i], ToolMessage):
+        tool_messages.append(messages[i])
+        i -= 1
+    chamadas = {call['id']: call for call in getattr(messages[i], 'tool_calls', [])} if i >= 0 else {}
+
+    for tool_msg in reversed(tool_messages):
+        args = chamadas.get(tool_msg.tool_call_id, {}).get('args', {})
+        audit_log.registrar("tool", args.get('cpf') or state.get("cpf"),
+                            tool=tool_msg.name, args=args, resultado=str(tool_msg.content), status=tool_msg.status)
+
 def post_tool_router(state):
+    auditar_tools(state)
+    destino = _post_tool_router(state)
+    audit_log.registrar("roteamento", state.get("cpf"), no="tools", destino=destino)
+    return destino
+
+def _post_tool_router(state):
     messages = state['messages']
     if len(messages) < 2: return END
     
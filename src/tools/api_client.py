@@ -1,6 +1,9 @@
 import os
 from serpapi import GoogleSearch
 from langchain.tools import tool
+from src.graph.deadline import tempo_restante
+
+COTACAO_TIMEOUT_S = 10
 
 @tool
 def cotacao_serpapi(moeda: str, quantidade: float = 1.0) -> str:
@@ -21,6 +24,9 @@ def cotacao_serpapi(moeda: str, quantidade: float = 1.0) -> str:
     
     try:
         search = GoogleSearch(params)
+        # o padrão da lib é 60000 segundos, usa o que sobra do turno
+        restante = tempo_restante()
+        search.timeout = min(COTACAO_TIMEOUT_S, restante) if restante is not None else COTACAO_TIMEOUT_S
         results = search.get_dict()
         
         if "currency_converter" in results:
@@ -0,0 +1,8 @@
+def limpar_cpf(cpf: str) -> str:
+    """CPF só com os dígitos, para comparar valores formatados (000.000.000-00) com os sem formatação."""
+    return str(cpf).replace(".", "").replace("-", "").strip()
+
+
+def limpar_cpfs(cpfs):
+    """Versão vetorizada do limpar_cpf para uma Series de texto do pandas."""
+    return cpfs.str.replace(".", "", regex=False).str.replace("-", "", regex=False).str.strip()
@@ -3,7 +3,12 @@ import os
 import shutil
 from datetime import datetime
 from tempfile import NamedTemporaryFile
+from typing import Annotated
 from langchain.tools import tool
+from langgraph.prebuilt import InjectedState
+from src.graph.state import snapshot_cliente
+from src.tools.cpf import limpar_cpf
+from src.tools.storage_service import enviar
 
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
@@ -13,6 +18,10 @@ CLIENTES_CSV = os.path.join(DATA_DIR, 'clientes.csv')
 SCORE_LIMITE_CSV = os.path.join(DATA_DIR, 'score_limite.csv')
 SOLICITACOES_CSV = os.path.join(DATA_DIR, 'solicitacoes_aumento_limite.csv')
 
+# se definido, leituras e escritas de clientes/solicitações passam pelo daemon de escrita única
+# (src/tools/storage_service.py) em vez de mexer direto nos arquivos
+STORAGE_SOCKET = os.getenv("STORAGE_SOCKET")
+
 
 def _garantir_diretorio():
     """Garante que a pasta data/ existe."""
@@ -21,36 +30,52 @@ def _garantir_diretorio():
 
 
 def validar_cliente(cpf_input: str, data_nascimento_input: str) -> dict | None:
+    if STORAGE_SOCKET:
+        return enviar(STORAGE_SOCKET, "validar_cliente", cpf=cpf_input, data_nascimento=data_nascimento_input)
     if not os.path.exists(CLIENTES_CSV):
         return None
 
-    cpf_limpo = cpf_input.replace(".", "").replace("-", "").strip()
+    cpf_limpo = limpar_cpf(cpf_input)
     
     with open(CLIENTES_CSV, mode='r', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         for row in reader:
-            row_cpf = row['cpf'].replace(".", "").replace("-", "").strip()
+            row_cpf = limpar_cpf(row['cpf'])
             if row_cpf == cpf_limpo and row['data_nascimento'] == data_nascimento_input:
                 return row
     return None
 
 
-@tool
-def buscar_dados_cliente(cpf: str) -> dict | None:
-    """Busca dados atualizados do cliente pelo CPF."""
+def carregar_cliente(cpf: str) -> dict | None:
+    """Lê a linha do cliente direto da base, sem passar pelo snapshot da sessão."""
+    if STORAGE_SOCKET:
+        return enviar(STORAGE_SOCKET, "buscar_cliente", cpf=cpf)
     if not os.path.exists(CLIENTES_CSV):
         return None
         
-    cpf_limpo = cpf.replace(".", "").replace("-", "").strip()
+    cpf_limpo = limpar_cpf(cpf)
     with open(CLIENTES_CSV, mode='r', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         for row in reader:
-            row_cpf = row['cpf'].replace(".", "").replace("-", "").strip()
+            row_cpf = limpar_cpf(row['cpf'])
             if row_cpf == cpf_limpo:
                 return row
     return None
 
 
+@tool
+def buscar_dados_cliente(cpf: str, state: Annotated[dict, InjectedState] = None) -> dict | None:  # type: ignore
+    """Busca dados atualizados do cliente pelo CPF."""
+    # o cliente autenticado já está no estado e é renovado a cada escrita, então não precisa ler o csv
+    cliente = (state or {}).get("cliente")
+    cpf_limpo = limpar_cpf(cpf)
+    if cliente and limpar_cpf(cliente["cpf"]) == cpf_limpo:
+        return dict(cliente)
+
+    row = carregar_cliente(cpf)
+    return snapshot_cliente(row) if row else None
+
+
 @tool
 def verificar_elegibilidade_aumento(score_atual: int, novo_limite: float) -> bool:
     """
@@ -77,6 +102,9 @@ def registrar_solicitacao(cpf: str, limite_atual: float, novo_limite: float, sta
     Registra a solicitação de aumento de limite conforme especificado.
     Colunas: cpf_cliente, data_hora_solicitacao, limite_atual, novo_limite_solicitado, status_pedido.
     """
+    if STORAGE_SOCKET:
+        return enviar(STORAGE_SOCKET, "registrar_solicitacao", cpf=cpf, limite_atual=limite_atual, novo_limite=novo_limite, status=status)
+
     _garantir_diretorio()
     
     cabecalho = ['cpf_cliente', 'data_hora_solicitacao', 'limite_atual', 'novo_limite_solicitado', 'status_pedido']
@@ -103,13 +131,16 @@ def processar_aprovacao_limite(cpf: str, novo_status: str) -> str:
     Se o novo_status for 'aprovado', atualiza também o limite_atual do cliente na base 'clientes.csv'
     com o valor que foi solicitado (novo_limite_solicitado).
     """
+    if STORAGE_SOCKET:
+        return enviar(STORAGE_SOCKET, "processar_aprovacao", cpf=cpf, novo_status=novo_status)
+
     # 1. Validação básica
     if not os.path.exists(SOLICITACOES_CSV):
         return "Erro: Arquivo de solicitações não encontrado."
     if not os.path.exists(CLIENTES_CSV):
         return "Erro: Arquivo de clientes não encontrado."
 
-    cpf_limpo = cpf.replace(".", "").replace("-", "").strip()
+    cpf_limpo = limpar_cpf(cpf)
     status_normalizado = novo_status.lower().strip()
 
     rows_solicitacoes = []
@@ -121,7 +152,7 @@ def processar_aprovacao_limite(cpf: str, novo_status: str) -> str:
     index_ultima = -1
     
     for i, row in enumerate(rows_solicitacoes):
-        r_cpf = row['cpf_cliente'].replace(".", "").replace("-", "").strip()
+        r_cpf = limpar_cpf(row['cpf_cliente'])
         if r_cpf == cpf_limpo:
             index_ultima = i
 
@@ -149,7 +180,7 @@ def processar_aprovacao_limite(cpf: str, novo_status: str) -> str:
             writer.writeheader()
 
             for row in reader:
-                row_cpf = row['cpf'].replace(".", "").replace("-", "").strip()
+                row_cpf = limpar_cpf(row['cpf'])
                 if row_cpf == cpf_limpo:
                     row['limite_atual'] = valor_novo_limite
                     cliente_encontrado = True
@@ -170,11 +201,14 @@ def atualizar_score_cliente(cpf: str, novo_score: int):
     """
     Atualiza o score do cliente na base de dados (clientes.csv).
     """
+    if STORAGE_SOCKET:
+        return enviar(STORAGE_SOCKET, "atualizar_score", cpf=cpf, novo_score=novo_score)
+
     if not os.path.exists(CLIENTES_CSV):
         return False
 
     temp_file = NamedTemporaryFile(mode='w', delete=False, newline='', encoding='utf-8')
-    cpf_limpo_target = cpf.replace(".", "").replace("-", "").strip()
+    cpf_limpo_target = limpar_cpf(cpf)
     atualizado = False
 
     with open(CLIENTES_CSV, mode='r', encoding='utf-8') as f_read, temp_file as f_write:
@@ -183,7 +217,7 @@ def atualizar_score_cliente(cpf: str, novo_score: int):
         writer.writeheader()
 
         for row in reader:
-            row_cpf = row['cpf'].replace(".", "").replace("-", "").strip()
+            row_cpf = limpar_cpf(row['cpf'])
             if row_cpf == cpf_limpo_target:
                 row['score'] = str(novo_score)
                 atualizado = True
@@ -0,0 +1,167 @@
+"""
+Liquidação em lote das solicitações de aumento de limite que ficaram 'pendente'.
+
+Quando o loop do agente é interrompido entre o registrar_solicitacao e o processar_aprovacao_limite,
+a solicitação fica pendente para sempre. Este worker lê o log de solicitações uma vez, junta os
+pendentes com o score atual de cada cliente pelo CPF, avalia todos de uma vez contra a tabela
+score_limite (mesma regra do verificar_elegibilidade_aumento) e grava todas as mudanças de status
+e de limite numa única reescrita de cada CSV.
+
+Uso:
+    python -m src.tools.liquidacao --dry-run     # só mostra o que seria feito
+    python -m src.tools.liquidacao
+
+Com o daemon de storage rodando (STORAGE_SOCKET) os arquivos são dele: pare o daemon antes,
+senão o próximo flush dele sobrescreve a liquidação.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.tools.cpf import limpar_cpfs
+from src.tools.csv_handler import CLIENTES_CSV, SCORE_LIMITE_CSV, SOLICITACOES_CSV, STORAGE_SOCKET
+
+
+STATUS_PENDENTE = "pendente"
+# pendente que já tem uma solicitação mais nova do mesmo CPF no log: o pedido antigo perdeu o sentido
+STATUS_SUBSTITUIDO = "substituido"
+
+
+def _ler(caminho: str) -> pd.DataFrame:
+    # tudo como texto para reescrever os arquivos sem mudar a formatação das colunas que não mexemos
+    return pd.read_csv(caminho, dtype=str, keep_default_na=False)
+
+
+def _escrever(caminho: str, df: pd.DataFrame):
+    temp = f"{caminho}.tmp"
+    df.to_csv(temp, index=False, encoding='utf-8')
+    os.replace(temp, caminho)
+
+
+def teto_por_score(scores: np.ndarray, politica: pd.DataFrame | None) -> np.ndarray:
+    """
+    Maior limite permitido para cada score. Uma faixa vale se score >= score_minimo, então o teto é
+    o maior limite_maximo entre as faixas que o score alcança (NaN se não alcança nenhuma ou se o
+    score é NaN).
+    """
+    if politica is None:
+        # mesma regra de quando não existe score_limite.csv: só score acima de 500, sem teto
+        return np.where(scores > 500, np.inf, np.nan)
+
+    politica = politica.sort_values("score_minimo")
+    minimos = politica["score_minimo"].to_numpy(dtype=float)
+    tetos = np.maximum.accumulate(politica["limite_maximo"].to_numpy(dtype=float))
+
+    faixa = np.searchsorted(minimos, scores, side="right") - 1
+    # o searchsorted joga NaN depois de tudo, ou seja, na faixa mais alta
+    return np.where((faixa >= 0) & ~np.isnan(scores), tetos[np.clip(faixa, 0, None)], np.nan)
+
+
+def avaliar_pendentes(solicitacoes: pd.DataFrame, clientes: pd.DataFrame, politica: pd.DataFrame | None) -> pd.DataFrame:
+    """
+    Decide todos os pendentes de uma vez. Devolve uma linha por pendente, indexada pela posição no
+    log de solicitações, com o score usado, o teto da política e o novo status (None quando o
+    cliente não existe na base e a solicitação continua pendente). O log é só de append, então um
+    pendente seguido de outra solicitação do mesmo CPF fica como substituido em vez de ser avaliado.
+    """
+    status = solicitacoes["status_pedido"].str.lower().str.strip()
+    cpf_log = limpar_cpfs(solicitacoes["cpf_cliente"])
+    pendentes = solicitacoes.loc[status == STATUS_PENDENTE, ["cpf_cliente", "novo_limite_solicitado"]].copy()
+    pendentes["cpf_limpo"] = cpf_log[pendentes.index]
+    pendentes["substituido"] = cpf_log.duplicated(keep="last")[pendentes.index]
+
+    scores = pd.DataFrame({
+        "cpf_limpo": limpar_cpfs(clientes["cpf"]),
+        "score": pd.to_numeric(clientes["score"], errors="coerce"),
+    }).drop_duplicates("cpf_limpo", keep="last")
+
+    avaliados = pendentes.reset_index().merge(scores, on="cpf_limpo", how="left").set_index("index")
+    avaliados["novo_limite"] = pd.to_numeric(avaliados["novo_limite_solicitado"], errors="coerce")
+    avaliados["teto"] = teto_por_score(avaliados["score"].to_numpy(dtype=float), politica)
+
+    aprovado = avaliados["novo_limite"].to_numpy() <= avaliados["teto"].to_numpy()
+    sem_cliente = avaliados["score"].isna().to_numpy()
+    substituido = avaliados["substituido"].to_numpy(dtype=bool)
+    avaliados["novo_status"] = np.where(substituido, STATUS_SUBSTITUIDO,
+                                        np.where(sem_cliente, None, np.where(aprovado, "aprovado", "rejeitado")))
+    return avaliados
+
+
+def liquidar(dry_run: bool = False, clientes_csv: str = CLIENTES_CSV, solicitacoes_csv: str = SOLICITACOES_CSV,
+             score_limite_csv: str = SCORE_LIMITE_CSV) -> dict:
+    inicio = time.perf_counter()
+
+    solicitacoes = _ler(solicitacoes_csv)
+    clientes = _ler(clientes_csv)
+    politica = pd.read_csv(score_limite_csv) if os.path.exists(score_limite_csv) else None
+    lido = time.perf_counter()
+
+    avaliados = avaliar_pendentes(solicitacoes, clientes, politica)
+    decididos = avaliados[avaliados["novo_status"].notna()]
+    aprovados = decididos[decididos["novo_status"] == "aprovado"]
+    novos_limites = aprovados.set_index("cpf_limpo")["novo_limite_solicitado"]
+    # aprovar nunca reduz o limite: se o cliente já tem um limite maior (ex: ajustado por fora), fica o dele
+    cpf_clientes = limpar_cpfs(clientes["cpf"])
+    limite_atual = pd.to_numeric(clientes["limite_atual"], errors="coerce").groupby(cpf_clientes).max()
+    novos_limites = novos_limites[~(pd.to_numeric(novos_limites).to_numpy() <= limite_atual.reindex(novos_limites.index).to_numpy())]
+    avaliado = time.perf_counter()
+
+    if not dry_run and len(decididos):
+        solicitacoes.loc[decididos.index, "status_pedido"] = decididos["novo_status"]
+        _escrever(solicitacoes_csv, solicitacoes)
+
+        if len(novos_limites):
+            alvo = cpf_clientes.isin(novos_limites.index)
+            clientes.loc[alvo, "limite_atual"] = cpf_clientes[alvo].map(novos_limites)
+            _escrever(clientes_csv, clientes)
+    fim = time.perf_counter()
+
+    duracao_avaliacao = avaliado - lido
+    return {
+        "dry_run": dry_run,
+        "solicitacoes": len(solicitacoes),
+        "pendentes": len(avaliados),
+        "aprovados": len(aprovados),
+        "rejeitados": int((decididos["novo_status"] == "rejeitado").sum()),
+        "substituidos": int((decididos["novo_status"] == STATUS_SUBSTITUIDO).sum()),
+        "sem_cliente": len(avaliados) - len(decididos),
+        "limites_atualizados": len(novos_limites),
+        "leitura_ms": (lido - inicio) * 1000,
+        "avaliacao_ms": duracao_avaliacao * 1000,
+        "escrita_ms": (fim - avaliado) * 1000,
+        "linhas_por_segundo": len(avaliados) / duracao_avaliacao if duracao_avaliacao else 0.0,
+        "linhas_por_segundo_total": len(avaliados) / (fim - inicio) if fim > inicio else 0.0,
+        "decisoes": [
+            {"cpf": row.cpf_cliente, "score": None if pd.isna(row.score) else int(row.score),
+             "novo_limite": row.novo_limite, "teto": None if pd.isna(row.teto) else float(row.teto),
+             "status": row.novo_status or STATUS_PENDENTE}
+            for row in avaliados.itertuples()
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Liquida em lote as solicitações de aumento de limite pendentes.")
+    parser.add_argument("--dry-run", action="store_true", help="avalia e mostra o relatório sem gravar nada")
+    parser.add_argument("--max-decisoes", type=int, default=20, help="quantas decisões listar no relatório")
+    args = parser.parse_args()
+
+    if STORAGE_SOCKET and not args.dry_run:
+        sys.exit("STORAGE_SOCKET definido: pare o daemon de storage antes de liquidar, senão o flush dele desfaz as mudanças.")
+
+    relatorio = liquidar(dry_run=args.dry_run)
+    decisoes = relatorio.pop("decisoes")
+    print(json.dumps(relatorio, indent=2))
+    for decisao in decisoes[:args.max_decisoes]:
+        print(json.dumps(decisao, ensure_ascii=False))
+    if len(decisoes) > args.max_decisoes:
+        print(f"... mais {len(decisoes) - args.max_decisoes} decisões")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Serviço de escrita única para os CSVs.
+
+Quando vários processos rodam o grafo, todos mandam as mutações para este daemon via socket Unix.
+Ele mantém clientes e solicitações em memória, aplica as alterações na hora (então qualquer leitura
+feita depois de uma escrita já enxerga o valor novo) e grava no disco uma vez por intervalo,
+juntando todas as alterações pendentes num único flush.
+
+Uso:
+    python -m src.tools.storage_service --socket /tmp/banco_agil.sock --intervalo 0.5
+e nos workers:
+    STORAGE_SOCKET=/tmp/banco_agil.sock streamlit run app.py
+"""
+import argparse
+import csv
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from src.tools.cpf import limpar_cpf
+
+
+def _ler_csv(caminho: str, cabecalho_padrao: list[str]):
+    if not os.path.exists(caminho):
+        return cabecalho_padrao, []
+    with open(caminho, mode='r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        return list(reader.fieldnames or cabecalho_padrao), list(reader)
+
+
+def _reescrever_csv(caminho: str, fieldnames: list[str], rows: list[dict]):
+    temp = f"{caminho}.tmp"
+    with open(temp, mode='w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(temp, caminho)
+
+
+class StorageService:
+    CABECALHO_CLIENTES = ['cpf', 'data_nascimento', 'nome', 'score', 'limite_atual']
+    CABECALHO_SOLICITACOES = ['cpf_cliente', 'data_hora_solicitacao', 'limite_atual', 'novo_limite_solicitado', 'status_pedido']
+
+    def __init__(self, clientes_csv: str, solicitacoes_csv: str, intervalo_flush: float = 0.5):
+        self.clientes_csv = clientes_csv
+        self.solicitacoes_csv = solicitacoes_csv
+        self.intervalo_flush = intervalo_flush
+        self._lock = threading.Lock()
+        # serializa os flushes (loop e parar) sem segurar o _lock durante o I/O
+        self._flush_lock = threading.Lock()
+        self._parar = threading.Event()
+
+        self._campos_clientes, self._clientes = _ler_csv(clientes_csv, self.CABECALHO_CLIENTES)
+        self._indice_clientes = {limpar_cpf(row['cpf']): row for row in self._clientes}
+        self._campos_solicitacoes, self._solicitacoes = _ler_csv(solicitacoes_csv, self.CABECALHO_SOLICITACOES)
+
+        self._clientes_sujo = False
+        self._reescrever_solicitacoes = False
+        self._solicitacoes_gravadas = len(self._solicitacoes)
+        self._pendentes = 0
+
+        self._inicio = time.monotonic()
+        self._ops = Counter()
+        self._flushes = 0
+        self._mutacoes_gravadas = 0
+        self._ultimo_flush_ms = 0.0
+
+    # leituras
+
+    def buscar_cliente(self, cpf: str) -> dict | None:
+        with self._lock:
+            self._ops["buscar_cliente"] += 1
+            row = self._indice_clientes.get(limpar_cpf(cpf))
+            return dict(row) if row else None
+
+    def validar_cliente(self, cpf: str, data_nascimento: str) -> dict | None:
+        with self._lock:
+            self._ops["validar_cliente"] += 1
+            row = self._indice_clientes.get(limpar_cpf(cpf))
+            if row and row['data_nascimento'] == data_nascimento:
+                return dict(row)
+            return None
+
+    # escritas
+
+    def atualizar_score(self, cpf: str, novo_score: int) -> bool:
+        with self._lock:
+            self._ops["atualizar_score"] += 1
+            row = self._indice_clientes.get(limpar_cpf(cpf))
+            if not row:
+                return False
+            row['score'] = str(novo_score)
+            self._clientes_sujo = True
+            self._pendentes += 1
+            return True
+
+    def registrar_solicitacao(self, cpf: str, limite_atual: float, novo_limite: float, status: str):
+        with self._lock:
+            self._ops["registrar_solicitacao"] += 1
+            self._solicitacoes.append({
+                'cpf_cliente': cpf,
+                'data_hora_solicitacao': datetime.now().isoformat(),
+                'limite_atual': limite_atual,
+                'novo_limite_solicitado': novo_limite,
+                'status_pedido': status
+            })
+            self._pendentes += 1
+
+    def processar_aprovacao(self, cpf: str, novo_status: str) -> str:
+        cpf_limpo = limpar_cpf(cpf)
+        status_normalizado = novo_status.lower().strip()
+
+        with self._lock:
+            self._ops["processar_aprovacao"] += 1
+            ultima = None
+            for row in self._solicitacoes:
+                if limpar_cpf(row['cpf_cliente']) == cpf_limpo:
+                    ultima = row
+            if ultima is None:
+                return f"Não foi encontrada nenhuma solicitação prévia para o CPF {cpf}."
+
+            ultima['status_pedido'] = status_normalizado
+            self._reescrever_solicitacoes = True
+            self._pendentes += 1
+            msg_retorno = f"Solicitação atualizada para '{status_normalizado}'."
+
+            if status_normalizado == 'aprovado':
+                valor_novo_limite = ultima['novo_limite_solicitado']
+                cliente = self._indice_clientes.get(cpf_limpo)
+                if cliente:
+                    cliente['limite_atual'] = valor_novo_limite
+                    self._clientes_sujo = True
+                    msg_retorno += f" Limite do cliente atualizado com sucesso para R$ {valor_novo_limite}."
+                else:
+                    msg_retorno += " AVISO: Cliente não encontrado na base principal para atualização de limite."
+            return msg_retorno
+
+    # persistência
+
+    def flush(self):
+        """
+        Grava no disco todas as alterações acumuladas desde o último flush.
+        Só a cópia das linhas sujas acontece com o lock; a escrita dos arquivos roda fora dele para não
+        travar as leituras e escritas dos workers durante o I/O.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pendentes:
+                    return
+                clientes = [dict(row) for row in self._clientes] if self._clientes_sujo else None
+                solicitacoes = novas_solicitacoes = None
+                if self._reescrever_solicitacoes:
+                    solicitacoes = [dict(row) for row in self._solicitacoes]
+                elif len(self._solicitacoes) > self._solicitacoes_gravadas:
+                    novas_solicitacoes = [dict(row) for row in self._solicitacoes[self._solicitacoes_gravadas:]]
+                pendentes = self._pendentes
+                self._solicitacoes_gravadas = len(self._solicitacoes)
+                self._clientes_sujo = False
+                self._reescrever_solicitacoes = False
+                self._pendentes = 0
+
+            inicio = time.perf_counter()
+            try:
+                if clientes is not None:
+                    _reescrever_csv(self.clientes_csv, self._campos_clientes, clientes)
+
+                if solicitacoes is not None:
+                    _reescrever_csv(self.solicitacoes_csv, self._campos_solicitacoes, solicitacoes)
+                elif novas_solicitacoes:
+                    arquivo_existe = os.path.exists(self.solicitacoes_csv)
+                    with open(self.solicitacoes_csv, mode='a', newline='', encoding='utf-8') as f:
+                        writer = csv.DictWriter(f, fieldnames=self._campos_solicitacoes)
+                        if not arquivo_existe:
+                            writer.writeheader()
+                        writer.writerows(novas_solicitacoes)
+            except Exception:
+                # nada se perde: no próximo flush os dois arquivos são reescritos inteiros a partir da memória
+                with self._lock:
+                    self._clientes_sujo = True
+                    self._reescrever_solicitacoes = True
+                    self._pendentes += pendentes
+                raise
+
+            with self._lock:
+                self._flushes += 1
+                self._mutacoes_gravadas += pendentes
+                self._ultimo_flush_ms = (time.perf_counter() - inicio) * 1000
+
+    def loop_flush(self):
+        while not self._parar.wait(self.intervalo_flush):
+            self.flush()
+
+    def parar(self):
+        self._parar.set()
+        self.flush()
+
+    def metricas(self) -> dict:
+        with self._lock:
+            total_ops = sum(self._ops.values())
+            duracao = time.monotonic() - self._inicio
+            return {
+                "ops_total": total_ops,
+                "ops_por_segundo": total_ops / duracao if duracao else 0.0,
+                "ops_por_tipo": dict(self._ops),
+                "fila_pendente": self._pendentes,
+                "flushes": self._flushes,
+                "mutacoes_por_flush": self._mutacoes_gravadas / self._flushes if self._flushes else 0.0,
+                "ultimo_flush_ms": self._ultimo_flush_ms,
+            }
+
+    def operacoes(self) -> dict:
+        return {
+            "buscar_cliente": self.buscar_cliente,
+            "validar_cliente": self.validar_cliente,
+            "atualizar_score": self.atualizar_score,
+            "registrar_solicitacao": self.registrar_solicitacao,
+            "processar_aprovacao": self.processar_aprovacao,
+            "metricas": self.metricas,
+        }
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    # uma requisição por linha em JSON: {"op": "...", "args": {...}}
+    def handle(self):
+        operacoes = self.server.operacoes  # type: ignore
+        for linha in self.rfile:
+            try:
+                pedido = json.loads(linha)
+                resultado = operacoes[pedido["op"]](**pedido.get("args", {}))
+                resposta = {"ok": True, "resultado": resultado}
+            except Exception as e:
+                resposta = {"ok": False, "erro": f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(resposta).encode('utf-8') + b"\n")
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def enviar(socket_path: str, op: str, **args):
+    """Cliente: manda uma operação para o daemon e devolve o resultado."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps({"op": op, "args": args}).encode('utf-8') + b"\n")
+        with sock.makefile('rb') as f:
+            resposta = json.loads(f.readline())
+    if not resposta["ok"]:
+        raise RuntimeError(f"Erro no serviço de storage: {resposta['erro']}")
+    return resposta["resultado"]
+
+
+def main():
+    from src.tools.csv_handler import CLIENTES_CSV, SOLICITACOES_CSV
+
+    parser = argparse.ArgumentParser(description="Daemon de escrita única dos CSVs do Banco Ágil.")
+    parser.add_argument("--socket", default=os.getenv("STORAGE_SOCKET", "/tmp/banco_agil_storage.sock"))
+    parser.add_argument("--intervalo", type=float, default=0.5, help="segundos entre flushes")
+    args = parser.parse_args()
+
+    if os.path.exists(args.socket):
+        os.remove(args.socket)
+
+    service = StorageService(CLIENTES_CSV, SOLICITACOES_CSV, args.intervalo)
+    threading.Thread(target=service.loop_flush, daemon=True).start()
+
+    with _Server(args.socket, _Handler) as server:
+        server.operacoes = service.operacoes()  # type: ignore
+        print(f"storage service ouvindo em {args.socket} (flush a cada {args.intervalo}s)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            service.parar()
+            os.remove(args.socket)
+            print(json.dumps(service.metricas(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
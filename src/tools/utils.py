@@ -1,11 +1,12 @@
 import re
 from datetime import datetime
 from langchain_core.messages import SystemMessage, HumanMessage, BaseMessage
-from typing import Optional, Literal
+from typing import List, Optional, Literal
 from pydantic import BaseModel, Field
 from langchain.tools import tool
 
-from src.graph.llm import llm
+from src.graph.llm import llm_para
+from src.graph.prompts import invocar
 
 
 class UserDate(BaseModel):
@@ -14,6 +15,10 @@ class UserDate(BaseModel):
 
 class UserIntent(BaseModel):
     user_intent: Literal["finalizado", "credito", "entrevista", "cambio", "nenhum"] = Field(description="A intenção do usuário na conversa")
+    intencoes_paralelas: List[Literal["credito", "cambio"]] = Field(
+        default_factory=list,
+        description="Preencha somente quando a última mensagem pedir crédito E câmbio ao mesmo tempo, ex: ['credito', 'cambio']. Caso contrário deixe vazio."
+    )
 
 
 # Modelo de dados para extração estruturada das respostas da entrevista
@@ -63,30 +68,22 @@ def extract_cpfs(text) -> str | None:
     return validate_cpf(match.group()) if match else None
 
 
-def extract_date(last_message):
-    data_llm = llm.with_structured_output(UserDate)
-
-    user_data = data_llm.invoke([
-        {
-            "role": "system",
-            "content": """ 
+PROMPT_EXTRAIR_DATA = """ 
                 extraia da mensagem do usuario a data de nascimento.
                 a data de nascimento deve ser retornado no formato: AAAA-MM-DD
             """
-        },
-        {
-            "role": "user",
-            "content": last_message
-        }
-    ])
+
+
+def extract_date(last_message):
+    data_llm = llm_para("extract_date").with_structured_output(UserDate)
+
+    user_data = invocar(data_llm, "extract_date", PROMPT_EXTRAIR_DATA, [HumanMessage(content=last_message)])
 
     validated_date = validate_date_format(user_data.data_nascimento or "") # type: ignore
     return validated_date if validated_date else None
     
 
-def extract_intent(messages):
-    intent_llm = llm.with_structured_output(UserIntent)
-    system_instruction = SystemMessage(content="""
+PROMPT_INTENCAO = """
         Você é um Especialista em Triagem Bancária do Banco Ágil.
         Sua única função é analisar o histórico de conversa e decidir qual departamento deve atender o usuário a seguir.
 
@@ -99,22 +96,29 @@ def extract_intent(messages):
         - "nenhum": Use para saudações iniciais (oi, bom dia), confirmações simples ou assuntos fora do contexto bancário.
 
         REGRA DE OURO: Se houver dúvida ou ambiguidade, classifique como "nenhum" (o fluxo padrão lidará com isso).
-    """)
-    input_messages = [system_instruction] + messages
-    intent = intent_llm.invoke(input_messages)
 
-    return intent.user_intent # type: ignore
+        PEDIDOS COMPOSTOS: Se a última mensagem pedir crédito e câmbio juntos (ex: "qual meu limite e quanto está o euro?"),
+        coloque a principal em "user_intent" e liste as duas em "intencoes_paralelas".
+    """
 
 
-def get_llm_response(tentativas_restantes, status_auth, feedback_sistema, last_message, messages):
-    system_prompt = f"""
+def extract_intent(messages):
+    intent_llm = llm_para("extract_intent").with_structured_output(UserIntent)
+    intent = invocar(intent_llm, "extract_intent", PROMPT_INTENCAO, messages)
+
+    #intencoes_paralelas só vale quando tem mais de um departamento de verdade
+    paralelas = list(dict.fromkeys(intent.intencoes_paralelas)) # type: ignore
+    return intent.user_intent, paralelas if len(paralelas) > 1 else [] # type: ignore
+
+
+PROMPT_TRIAGEM = """
     # IDENTIDADE
     Você é um agente de triagem bancário eficiente e seguro.
     Sempre responda de maneira polida e humana.
     Se o usuario tentar mudar o foco da conversa ou falar algo aleatorio tente educadamente retornar ao ponto.
     
     # REGRAS DE NEGÓCIO
-    1. O cliente tem no máximo 3 tentativas de autenticação e ultilize esse numero exclusivamente ignore o historico. (Restantes: {tentativas_restantes})
+    1. O cliente tem no máximo 3 tentativas de autenticação e ultilize esse numero exclusivamente ignore o historico. (Restantes: veja 'tentativas_restantes' no CONTEXTO ATUAL)
     2. Se 'AUTENTICADO', não peça mais CPF/Data. Pergunte como pode ajudar e direcione para: Crédito, Entrevista ou Câmbio.
     3. Se 'NÃO AUTENTICADO', peça CPF e Data de Nascimento educadamente.
     4. Primeiro peça pelo cpf
@@ -122,33 +126,32 @@ def get_llm_response(tentativas_restantes, status_auth, feedback_sistema, last_m
     6. Temos validação inteligente de cpf e data de nascimento não precisa de padrão (não falar para o usuario)
     7. Caso ocorra uma falha de autenticação INFORME o cliente
     
-    
-    # ESTADO ATUAL (CONTEXTO DO SISTEMA)
-    - Status: {status_auth}
-    - Feedback da Validação Anterior: {feedback_sistema}
-    Historico de Mensagens:
-    {messages}
+    # ESTADO ATUAL
+    O status de autenticação e o feedback da validação anterior estão no bloco CONTEXTO ATUAL no final da conversa.
     """
 
-    response = llm.invoke([
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=last_message.content)
-    ])
+
+def get_llm_response(tentativas_restantes, status_auth, feedback_sistema, last_message, messages):
+    # last_message já é o fim de messages, o historico vai como mensagens de verdade e não como texto no prompt
+    contexto = {
+        "tentativas_restantes": tentativas_restantes,
+        "status": status_auth,
+        "feedback_validacao_anterior": feedback_sistema,
+    }
+    response = invocar(llm_para("triagem"), "triagem", PROMPT_TRIAGEM, messages, contexto)
     return response
 
 
-def end_conversation(messages):
-    system_prompt = f"""
+PROMPT_FINALIZACAO = """
     # IDENTIDADE
     Você é um agente de finalização de conversa.
     Sempre responda de maneira polida e humana.
     Se o usuario se despedir (tchau, obrigado, sair) ou disser explicitamente que não precisa de mais nada, encerre a conversa cordialmente.
-    mensagens anteriores: {messages}
     """
-    response = llm.invoke([
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=messages[-1].content)
-    ])
+
+
+def end_conversation(messages):
+    response = invocar(llm_para("end_conversation"), "end_conversation", PROMPT_FINALIZACAO, messages)
     return response
 
 
@@ -203,7 +206,7 @@ def calculate_score(
 
 #depreciado
 def extract_financial_profile(messages: list[BaseMessage]):
-    structured_llm = llm.with_structured_output(FinancialProfile)
+    structured_llm = llm_para("financial_profile").with_structured_output(FinancialProfile)
     
     extraction_system = """
     Você é um especialista em análise de dados financeiros.